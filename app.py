@@ -6,6 +6,7 @@ import structlog
 from retrying import RetryError
 
 from logger_config import logger_initial_config
+from ras_party.support.schema_validation import get_schema_validator
 from run import create_app, initialise_db
 
 
@@ -19,6 +20,7 @@ app = create_app()
 
 with open(app.config['PARTY_SCHEMA']) as io:
     app.config['PARTY_SCHEMA'] = loads(io.read())
+get_schema_validator(app.config['PARTY_SCHEMA'])  # compile the schema once, at startup
 
 logger_initial_config(log_level=app.config['LOGGING_LEVEL'])
 
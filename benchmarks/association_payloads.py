@@ -0,0 +1,91 @@
+"""
+Micro-benchmark of building and serialising the associations of a business with many respondents: nested dicts with
+the enum names looked up per row (as before), nested dicts with the names from lookup tables (as now), and slotted
+dataclass records, which orjson serialises natively but reads one slot at a time.
+
+Usage: python -m benchmarks.association_payloads [--respondents 5000] [--surveys 3] [--repeat 5] [--number 20]
+"""
+import argparse
+import timeit
+import uuid
+from collections import namedtuple
+from dataclasses import dataclass
+
+import orjson
+
+from ras_party.models.models import EnrolmentStatus, ENROLMENT_STATUS_NAMES, RespondentStatus, \
+    RESPONDENT_STATUS_NAMES
+
+Row = namedtuple('Row', ['party_uuid', 'status', 'enrolments'])
+EnrolmentRow = namedtuple('EnrolmentRow', ['survey_id', 'status'])
+
+
+@dataclass
+class EnrolmentRecord:
+    __slots__ = ('enrolmentStatus', 'surveyId')
+    enrolmentStatus: str
+    surveyId: str
+
+
+@dataclass
+class AssociationRecord:
+    __slots__ = ('businessRespondentStatus', 'enrolments', 'partyId')
+    businessRespondentStatus: str
+    enrolments: list
+    partyId: uuid.UUID
+
+
+def enum_call_dicts(rows):
+    return [{
+        "partyId": row.party_uuid,
+        "businessRespondentStatus": RespondentStatus(row.status).name,
+        "enrolments": [{"surveyId": enrolment.survey_id, "enrolmentStatus": EnrolmentStatus(enrolment.status).name}
+                       for enrolment in row.enrolments]
+    } for row in rows]
+
+
+def lookup_table_dicts(rows):
+    return [{
+        "partyId": row.party_uuid,
+        "businessRespondentStatus": RESPONDENT_STATUS_NAMES[row.status],
+        "enrolments": [{"surveyId": enrolment.survey_id, "enrolmentStatus": ENROLMENT_STATUS_NAMES[enrolment.status]}
+                       for enrolment in row.enrolments]
+    } for row in rows]
+
+
+def slotted_records(rows):
+    return [AssociationRecord(RESPONDENT_STATUS_NAMES[row.status],
+                              [EnrolmentRecord(ENROLMENT_STATUS_NAMES[enrolment.status], enrolment.survey_id)
+                               for enrolment in row.enrolments],
+                              row.party_uuid)
+            for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--respondents', type=int, default=5000, help='number of respondents associated')
+    parser.add_argument('--surveys', type=int, default=3, help='enrolments per respondent')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    survey_ids = [str(uuid.uuid4()) for _ in range(args.surveys)]
+    rows = [Row(uuid.uuid4(), RespondentStatus.ACTIVE, [EnrolmentRow(survey_id, EnrolmentStatus.ENABLED)
+                                                        for survey_id in survey_ids])
+            for _ in range(args.respondents)]
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+
+    print(f'build and serialise {args.respondents} associations with {args.surveys} enrolments each '
+          f'(best of {args.repeat} x {args.number})')
+    for name, build in (('dicts, enum calls', enum_call_dicts), ('dicts, lookup tables', lookup_table_dicts),
+                        ('slotted records', slotted_records)):
+        associations = build(rows)
+        built = min(timeit.repeat(lambda: build(rows), repeat=args.repeat, number=args.number)) / args.number
+        dumped = min(timeit.repeat(lambda: orjson.dumps(associations, option=option),
+                                   repeat=args.repeat, number=args.number)) / args.number
+        print(f'  {name:<21} build {built * 1000:7.2f} ms  serialise {dumped * 1000:7.2f} ms  '
+              f'total {(built + dumped) * 1000:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Micro-benchmark of generating and decoding email tokens with a URLSafeTimedSerializer built per call, as
+generate_email_token and decode_email_token used to, against the serializers now built once per app.
+
+Usage: python -m benchmarks.email_tokens [--repeat 5] [--number 10000]
+"""
+import argparse
+import timeit
+
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer
+
+from ras_party.support.verification import decode_email_token, generate_email_token, logger
+from run import create_app
+
+EMAIL = 'respondent@example.com'
+
+
+def generate_per_call():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY']).dumps(
+        EMAIL, salt=current_app.config['EMAIL_TOKEN_SALT'])
+
+
+def decode_per_call(token):
+    logger.info('Decoding email verification token', token=token)
+    result = URLSafeTimedSerializer(current_app.config['SECRET_KEY']).loads(
+        token, salt=current_app.config['EMAIL_TOKEN_SALT'], max_age=3600)
+    logger.info('Successfully decoded email verification token', token=token)
+    return result
+
+
+def best_of(func, repeat, number):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=10000)
+    args = parser.parse_args()
+
+    app = create_app('TestingConfig')
+    with app.app_context():
+        token = generate_email_token(EMAIL)
+        assert decode_per_call(token) == decode_email_token(token, 3600) == EMAIL
+
+        print(f'email tokens (best of {args.repeat} x {args.number})')
+        for name, before, after in (('generate', generate_per_call, lambda: generate_email_token(EMAIL)),
+                                    ('decode', lambda: decode_per_call(token),
+                                     lambda: decode_email_token(token, 3600))):
+            before = best_of(before, args.repeat, args.number)
+            after = best_of(after, args.repeat, args.number)
+            print(f'  {name:<9} per call {before * 1e6:7.1f} us  cached {after * 1e6:7.1f} us  '
+                  f'speed up {before / after:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Micro-benchmark of serialising business summaries with jsonify, using Flask's default JSONEncoder and the
+OrjsonEncoder registered in create_app.
+
+Usage: python -m benchmarks.json_serialisation [--count 1000] [--repeat 5] [--number 20]
+"""
+import argparse
+import timeit
+import uuid
+
+from flask import jsonify
+from flask.json import JSONEncoder
+
+from ras_party.support.json_encoder import OrjsonEncoder
+from run import create_app
+
+
+def business_summaries(count):
+    return [{
+        'id': uuid.uuid4(),
+        'sampleUnitRef': str(49900000000 + i),
+        'sampleUnitType': 'B',
+        'sampleSummaryId': str(uuid.uuid4()),
+        'name': f'Runame-1 Runame-2 Runame-3 {i}',
+        'trading_as': f'Tradstyle-1 Tradstyle-2 Tradstyle-3 {i}',
+        'associations': [{
+            'partyId': uuid.uuid4(),
+            'businessRespondentStatus': 'ACTIVE',
+            'enrolments': [{'surveyId': str(uuid.uuid4()), 'enrolmentStatus': 'ENABLED'} for _ in range(2)]
+        } for _ in range(2)]
+    } for i in range(count)]
+
+
+def time_encoder(app, encoder, payload, repeat, number):
+    app.json_encoder = encoder
+    with app.test_request_context():
+        timings = timeit.repeat(lambda: jsonify(payload), repeat=repeat, number=number)
+    return min(timings) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000, help='number of business summaries to serialise')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app('TestingConfig')
+    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    app.debug = False
+    payload = business_summaries(args.count)
+
+    before = time_encoder(app, JSONEncoder, payload, args.repeat, args.number)
+    after = time_encoder(app, OrjsonEncoder, payload, args.repeat, args.number)
+
+    print(f'jsonify {args.count} business summaries (best of {args.repeat} x {args.number})')
+    print(f'  flask JSONEncoder : {before * 1000:8.2f} ms')
+    print(f'  OrjsonEncoder     : {after * 1000:8.2f} ms')
+    print(f'  speed up          : {before / after:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
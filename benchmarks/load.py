@@ -0,0 +1,175 @@
+"""
+Load benchmark of the endpoints behind the busiest journeys, run in process against the data set loaded by
+benchmarks.load_data, with the other services stubbed (as in the tests).  Each scenario makes --requests requests from
+--concurrency threads after --warmup requests, and its latency percentiles and throughput are reported.  Results can
+be saved, and compared with saved results to fail (exit 1) when a scenario's p95 is more than --max-regression worse.
+
+Usage: python -m benchmarks.load [--requests 500] [--concurrency 4] [--warmup 20] [--scenario search ...]
+                                 [--save results.json] [--compare baseline.json] [--max-regression 0.2]
+"""
+import argparse
+import base64
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from sqlalchemy import text
+
+from benchmarks.load_data import DEFAULT_SCHEMA, LAST_NAMES, NAME_WORDS
+from logger_config import logger_initial_config
+from ras_party.support.requests_wrapper import Requests
+from run import create_app, create_database
+from test.mocks import MockRequests
+
+SAMPLE_SIZE = 200
+
+
+def business_search(samples, i):
+    words = NAME_WORDS[i % len(NAME_WORDS)], NAME_WORDS[(i * 7 + 3) % len(NAME_WORDS)]
+    return 'GET', f"/party-api/v1/businesses/search?{urlencode({'query': ' '.join(words), 'limit': 25})}", None
+
+
+def business_verbose(samples, i):
+    business_id = samples['businesses'][i % len(samples['businesses'])]
+    return 'GET', f'/party-api/v1/businesses/id/{business_id}?verbose=true', None
+
+
+def respondent_search(samples, i):
+    last_name = LAST_NAMES[i % len(LAST_NAMES)]
+    return 'GET', f"/party-api/v1/respondents?{urlencode({'lastName': last_name, 'page': 1, 'limit': 10})}", None
+
+
+def claim(samples, i):
+    respondent_id, business_id, survey_id = samples['claims'][i % len(samples['claims'])]
+    query = urlencode({'respondent_id': respondent_id, 'business_id': business_id, 'survey_id': survey_id})
+    return 'GET', f'/party-api/v1/respondents/claim?{query}', None
+
+
+def registration(samples, i):
+    return 'POST', '/party-api/v1/respondents', {
+        'emailAddress': f'benchmark-{uuid.uuid4()}@example.com', 'firstName': 'Load', 'lastName': 'Benchmark',
+        'password': 'password', 'telephone': '01234567890', 'enrolmentCode': 'fb747cq725lj'}
+
+
+SCENARIOS = {
+    'search': business_search,
+    'business_verbose': business_verbose,
+    'respondent_search': respondent_search,
+    'claim': claim,
+    'registration': registration,
+}
+
+
+def load_samples(session, schema):
+    """Ids to request, chosen the same way every run"""
+    businesses = session.execute(text(
+        f'SELECT party_uuid FROM {schema}.business ORDER BY md5(party_uuid::text) LIMIT {SAMPLE_SIZE}')).fetchall()
+    claims = session.execute(text(
+        f'SELECT respondent.party_uuid, enrolment.business_id, enrolment.survey_id FROM {schema}.enrolment '
+        f'JOIN {schema}.respondent ON respondent.id = enrolment.respondent_id '
+        f'ORDER BY md5(respondent.party_uuid::text || enrolment.survey_id) LIMIT {SAMPLE_SIZE}')).fetchall()
+    if not businesses or not claims:
+        raise SystemExit('No data to benchmark, load it with python -m benchmarks.load_data first')
+    return {'businesses': [str(row[0]) for row in businesses],
+            'claims': [tuple(str(value) for value in row) for row in claims]}
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_scenario(app, scenario, samples, requests, concurrency, warmup):
+    auth = {'Authorization': 'Basic ' + base64.b64encode(
+        f"{app.config['SECURITY_USER_NAME']}:{app.config['SECURITY_USER_PASSWORD']}".encode()).decode()}
+    clients = threading.local()
+
+    def call(i):
+        if not hasattr(clients, 'client'):
+            clients.client = app.test_client()
+        method, url, payload = scenario(samples, i)
+        start = time.perf_counter()
+        response = clients.client.open(url, method=method, json=payload, headers=auth)
+        return time.perf_counter() - start, response.status_code
+
+    for i in range(warmup):
+        call(-1 - i)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(call, range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'requests': requests,
+        'errors': sum(1 for _, status in results if status >= 400),
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'mean': sum(latencies) / len(latencies),
+        'throughput': requests / elapsed,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Prints each scenario's p95 against the baseline's, and returns the names of those that have regressed"""
+    regressed = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = result['p95'] / baseline[name]['p95'] - 1
+        print(f'  {name:<18} p95 {baseline[name]["p95"] * 1000:8.1f} -> {result["p95"] * 1000:8.1f} ms '
+              f'({change:+.0%})')
+        if change > max_regression:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--schema', default=DEFAULT_SCHEMA)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Defaults to all of them')
+    parser.add_argument('--save', help='Write the results to this json file')
+    parser.add_argument('--compare', help='Compare the results with those saved in this json file')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    app = create_app('TestingConfig')
+    logger_initial_config(log_level='ERROR')
+    app.config['DATABASE_SCHEMA'] = args.schema
+    app.config['SEND_EMAIL_TO_GOV_NOTIFY'] = False
+    app.db = create_database(app.config['DATABASE_URI'], args.schema)
+    Requests._lib = MockRequests()
+
+    session = app.db.session()
+    samples = load_samples(session, args.schema)
+    app.db.session.remove()
+
+    results = {}
+    print(f'{"scenario":<18} {"requests":>8} {"errors":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"req/s":>8}')
+    for name in args.scenario or SCENARIOS:
+        result = results[name] = run_scenario(app, SCENARIOS[name], samples, args.requests, args.concurrency,
+                                              args.warmup)
+        print(f'{name:<18} {result["requests"]:>8} {result["errors"]:>6} {result["p50"] * 1000:>8.1f} '
+              f'{result["p95"] * 1000:>8.1f} {result["p99"] * 1000:>8.1f} {result["throughput"]:>8.1f}')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.max_regression)
+        if regressed:
+            print(f'p95 regressed by more than {args.max_regression:.0%}: {", ".join(regressed)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
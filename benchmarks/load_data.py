@@ -0,0 +1,143 @@
+"""
+Generates a reproducible data set for the load benchmark (benchmarks.load) and bulk loads it with COPY into a schema of
+a local postgres, which is dropped and recreated first.  Each business has --versions attribute versions (one per
+collection exercise) and --respondents respondents, each enrolled on every one of --surveys surveys, and a
+--pending-shares fraction of businesses have a pending share.  The first business is the one the stubbed case service
+returns for the registration scenario.
+
+Usage: python -m benchmarks.load_data [--businesses 20000] [--versions 5] [--respondents 2] [--surveys 3]
+                                      [--pending-shares 0.1] [--seed 1] [--schema partysvc_benchmark]
+"""
+import argparse
+import datetime
+import io
+import json
+import random
+import time
+import uuid
+
+from sqlalchemy import create_engine
+
+from config import Config
+from run import create_database
+from test.test_data.default_test_values import DEFAULT_BUSINESS_UUID, DEFAULT_SURVEY_UUID
+
+DEFAULT_SCHEMA = 'partysvc_benchmark'
+REGISTRATION_COLLECTION_EXERCISE_ID = 'dab9db7f-3aa0-4866-be20-54d72ee185fb'
+
+NAME_WORDS = ['Acme', 'Northern', 'Southern', 'Eastern', 'Western', 'Royal', 'United', 'General', 'National', 'Global',
+              'Bakery', 'Engineering', 'Foods', 'Holdings', 'Logistics', 'Motors', 'Textiles', 'Software', 'Energy',
+              'Builders', 'Brewery', 'Farms', 'Chemicals', 'Retail', 'Shipping', 'Metals', 'Printing', 'Pharma']
+FIRST_NAMES = ['Alex', 'Sam', 'Jo', 'Chris', 'Pat', 'Jamie', 'Robin', 'Charlie', 'Morgan', 'Taylor', 'Ashley', 'Casey']
+LAST_NAMES = ['Smith', 'Jones', 'Williams', 'Taylor', 'Brown', 'Davies', 'Evans', 'Wilson', 'Thomas', 'Johnson',
+              'Roberts', 'Robinson', 'Thompson', 'Wright', 'Walker', 'White', 'Edwards', 'Hughes', 'Green', 'Hall']
+
+
+def _copy(cursor, schema, table, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(r'\N' if value is None else str(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {schema}.{table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def generate(engine, schema, businesses, versions, respondents, surveys, pending_shares, seed):
+    """
+    Loads the data set into the (empty) tables of the schema
+
+    :return: The number of rows loaded into each table
+    """
+    rng = random.Random(seed)
+
+    def new_uuid():
+        return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+    start = datetime.datetime(2020, 1, 1)
+    survey_ids = [DEFAULT_SURVEY_UUID] + [str(new_uuid()) for _ in range(surveys - 1)]
+    collection_exercises = [(str(new_uuid()), str(new_uuid()), start + datetime.timedelta(days=30 * version))
+                            for version in range(versions)]
+    collection_exercises[-1] = (REGISTRATION_COLLECTION_EXERCISE_ID,) + collection_exercises[-1][1:]
+
+    business_rows, attribute_rows, respondent_rows = [], [], []
+    business_respondent_rows, enrolment_rows, pending_share_rows = [], [], []
+    respondent_id = 0
+    for number in range(businesses):
+        party_uuid = DEFAULT_BUSINESS_UUID if number == 0 else str(new_uuid())
+        business_ref = str(49900000000 + number)
+        business_rows.append((party_uuid, business_ref, start))
+        name = ' '.join(rng.sample(NAME_WORDS, 3))
+        trading_as = f'{name} Trading'
+        for collection_exercise, sample_summary_id, created_on in collection_exercises:
+            attributes = {'sampleUnitType': 'B', 'name': name, 'trading_as': trading_as, 'runame1': name,
+                          'tradstyle1': trading_as, 'checkletter': 'A', 'region': 'UK', 'legalstatus': '1',
+                          'froempment': rng.randint(1, 5000), 'frotover': rng.randint(1, 100000),
+                          'entref': business_ref, 'cell_no': rng.randint(1, 9)}
+            attribute_rows.append((party_uuid, sample_summary_id, collection_exercise, json.dumps(attributes),
+                                   created_on, name, trading_as))
+
+        for _ in range(respondents):
+            respondent_id += 1
+            respondent_uuid = str(new_uuid())
+            respondent_rows.append((respondent_id, respondent_uuid, 'ACTIVE', f'respondent{respondent_id}@example.com',
+                                    rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), '01234567890', False, start))
+            business_respondent_rows.append((party_uuid, respondent_id, 'ACTIVE', start, start))
+            for survey_id in survey_ids:
+                enrolment_rows.append((party_uuid, respondent_id, survey_id, 'ENABLED', start))
+        if respondents and rng.random() < pending_shares:
+            pending_share_rows.append((f'share{number}@example.com', party_uuid, survey_ids[0], start,
+                                       respondent_rows[-1][1], str(new_uuid())))
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        _copy(cursor, schema, 'business', ['party_uuid', 'business_ref', 'created_on'], business_rows)
+        _copy(cursor, schema, 'business_attributes',
+              ['business_id', 'sample_summary_id', 'collection_exercise', 'attributes', 'created_on', 'name',
+               'trading_as'], attribute_rows)
+        _copy(cursor, schema, 'respondent',
+              ['id', 'party_uuid', 'status', 'email_address', 'first_name', 'last_name', 'telephone',
+               'mark_for_deletion', 'created_on'], respondent_rows)
+        cursor.execute(f"SELECT setval(pg_get_serial_sequence('{schema}.respondent', 'id'), {max(respondent_id, 1)})")
+        _copy(cursor, schema, 'business_respondent',
+              ['business_id', 'respondent_id', 'status', 'effective_from', 'created_on'], business_respondent_rows)
+        _copy(cursor, schema, 'enrolment', ['business_id', 'respondent_id', 'survey_id', 'status', 'created_on'],
+              enrolment_rows)
+        _copy(cursor, schema, 'pending_shares',
+              ['email_address', 'business_id', 'survey_id', 'time_shared', 'shared_by', 'batch_no'],
+              pending_share_rows)
+        cursor.execute('ANALYZE')
+        connection.commit()
+    finally:
+        connection.close()
+
+    return {'business': len(business_rows), 'business_attributes': len(attribute_rows),
+            'respondent': len(respondent_rows), 'business_respondent': len(business_respondent_rows),
+            'enrolment': len(enrolment_rows), 'pending_shares': len(pending_share_rows)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-uri', default=Config.DATABASE_URI)
+    parser.add_argument('--schema', default=DEFAULT_SCHEMA)
+    parser.add_argument('--businesses', type=int, default=20000)
+    parser.add_argument('--versions', type=int, default=5)
+    parser.add_argument('--respondents', type=int, default=2)
+    parser.add_argument('--surveys', type=int, default=3)
+    parser.add_argument('--pending-shares', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    create_engine(args.database_uri).execute(f'DROP SCHEMA IF EXISTS {args.schema} CASCADE')
+    engine = create_database(args.database_uri, args.schema)
+
+    started = time.perf_counter()
+    counts = generate(engine, args.schema, args.businesses, args.versions, args.respondents, args.surveys,
+                      args.pending_shares, args.seed)
+    print(f'loaded {args.schema} in {time.perf_counter() - started:.1f}s')
+    for table, count in counts.items():
+        print(f'  {table:<20} {count:>9} rows')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Micro-benchmark of logging a query function's events with the logging config as it was (JSON rendered by json, the
+level checked after adding the severity, loggers not cached, bound lists logged in full) against logger_initial_config:
+a debug event below the log level, and an info event with the 1000 party uuids of a list endpoint bound to it.
+
+Usage: python -m benchmarks.log_events [--repeat 5] [--number 2000]
+"""
+import argparse
+import logging
+import os
+import timeit
+import uuid
+
+import structlog
+from structlog.processors import JSONRenderer, TimeStamper, format_exc_info
+from structlog.stdlib import add_log_level, filter_by_level
+
+from logger_config import logger_initial_config
+
+PARTY_UUIDS = [uuid.uuid4() for _ in range(1000)]
+
+
+def configure_as_before():
+    def add_severity_level(logger, method_name, event_dict):
+        event_dict['severity'] = method_name
+        return event_dict
+
+    def add_service(logger, method_name, event_dict):
+        event_dict['service'] = 'ras-party'
+        return event_dict
+
+    structlog.configure(processors=[add_severity_level, add_log_level, filter_by_level, add_service, format_exc_info,
+                                    TimeStamper(fmt="%Y-%m-%dT%H:%M%s", utc=True, key="created_at"), JSONRenderer()],
+                        cache_logger_on_first_use=False)
+
+
+def time_events(repeat, number):
+    logger = structlog.wrap_logger(logging.getLogger('benchmarks.log_events'))
+    events = {
+        'debug, filtered': lambda: logger.debug('Querying businesses by party_uuid', party_uuid=PARTY_UUIDS[0]),
+        'info, 1000 uuids': lambda: logger.info('Querying businesses by party_uuids', party_uuids=PARTY_UUIDS),
+    }
+    return {name: min(timeit.repeat(event, repeat=repeat, number=number)) / number for name, event in events.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.basicConfig(stream=open(os.devnull, 'w'), level='INFO', format='%(message)s')
+    configure_as_before()
+    before = time_events(args.repeat, args.number)
+    logger_initial_config('INFO')
+    after = time_events(args.repeat, args.number)
+
+    print(f'log events (best of {args.repeat} x {args.number})')
+    for name in before:
+        print(f'  {name:<17} before {before[name] * 1e6:7.1f} us  now {after[name] * 1e6:7.1f} us  '
+              f'speed up {before[name] / after[name]:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
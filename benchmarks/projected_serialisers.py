@@ -0,0 +1,117 @@
+"""
+Benchmark of building the /businesses?id= and /respondents?id= responses from ORM instances (to_business_summary_dict
+and to_respondent_dict) against building them from column-projected rows, as get_businesses_by_ids and
+get_respondent_by_ids now do.
+
+Needs the database in DATABASE_URI; the data is generated in its own schema, which is dropped afterwards.
+
+Usage: python -m benchmarks.projected_serialisers [--count 250] [--respondents 2] [--surveys 2] [--repeat 5]
+"""
+import argparse
+import datetime
+import timeit
+import uuid
+
+from flask import current_app
+
+from ras_party.controllers.business_controller import get_businesses_by_ids
+from ras_party.controllers.queries import query_businesses_by_party_uuids, query_respondent_by_party_uuids
+from ras_party.controllers.respondent_controller import get_respondent_by_ids
+from ras_party.models.models import Business, BusinessAttributes, BusinessRespondent, Enrolment, EnrolmentStatus, \
+    Respondent, RespondentStatus
+from ras_party.support.session_decorator import with_query_only_db_session
+from run import create_app, create_database
+
+
+@with_query_only_db_session
+def orm_businesses_by_ids(party_uuids, session):
+    return [business.to_business_summary_dict() for business in query_businesses_by_party_uuids(party_uuids, session)]
+
+
+@with_query_only_db_session
+def orm_respondents_by_ids(party_uuids, session):
+    return [respondent.to_respondent_dict() for respondent in query_respondent_by_party_uuids(party_uuids, session)]
+
+
+def generate(session, count, respondents_per_business, surveys):
+    now = datetime.datetime.utcnow()
+    survey_ids = [str(uuid.uuid4()) for _ in range(surveys)]
+    business_ids = [uuid.uuid4() for _ in range(count)]
+    businesses, attributes, respondents, associations, enrolments = [], [], [], [], []
+    respondent_id = 0
+    for i, business_id in enumerate(business_ids):
+        ref = str(49900000000 + i)
+        businesses.append({'party_uuid': business_id, 'business_ref': ref, 'created_on': now})
+        for version in range(2):
+            attributes.append({
+                'business_id': business_id, 'sample_summary_id': str(uuid.uuid4()),
+                'collection_exercise': str(uuid.uuid4()), 'created_on': now - datetime.timedelta(days=version),
+                'attributes': {'sampleUnitRef': ref, 'runame1': 'Runame', 'name': f'Runame {i}',
+                               'trading_as': f'Tradstyle {i}'},
+                'name': f'Runame {i}', 'trading_as': f'Tradstyle {i}'})
+        for _ in range(respondents_per_business):
+            respondent_id += 1
+            respondents.append({
+                'id': respondent_id, 'party_uuid': uuid.uuid4(), 'status': RespondentStatus.ACTIVE,
+                'email_address': f'respondent{respondent_id}@example.com', 'first_name': 'First',
+                'last_name': 'Last', 'telephone': '0123456789', 'mark_for_deletion': False, 'created_on': now})
+            associations.append({'business_id': business_id, 'respondent_id': respondent_id, 'created_on': now})
+            enrolments.extend({'business_id': business_id, 'respondent_id': respondent_id, 'survey_id': survey_id,
+                               'status': EnrolmentStatus.ENABLED, 'created_on': now} for survey_id in survey_ids)
+
+    for model, rows in ((Business, businesses), (BusinessAttributes, attributes), (Respondent, respondents),
+                        (BusinessRespondent, associations), (Enrolment, enrolments)):
+        session.bulk_insert_mappings(model, rows)
+    session.commit()
+    return [str(business_id) for business_id in business_ids], [str(r['party_uuid']) for r in respondents]
+
+
+def canonical(value):
+    """Neither path orders parties, associations or enrolments, so compare them regardless of order"""
+    if isinstance(value, dict):
+        return {key: canonical(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return sorted((canonical(item) for item in value), key=repr)
+    return value
+
+
+def best_of(func, ids, repeat, number):
+    return min(timeit.repeat(lambda: func(ids), repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=250, help='number of businesses to fetch')
+    parser.add_argument('--respondents', type=int, default=2, help='respondents per business')
+    parser.add_argument('--surveys', type=int, default=2, help='enrolments per respondent')
+    parser.add_argument('--schema', default='partysvc_benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_app('TestingConfig')
+    with app.app_context():
+        app.db = create_database(app.config['DATABASE_URI'], args.schema)
+        try:
+            business_ids, respondent_ids = generate(app.db.session(), args.count, args.respondents, args.surveys)
+            current_app.db.session.remove()
+
+            assert canonical(orm_businesses_by_ids(business_ids)) == canonical(get_businesses_by_ids(business_ids))
+            assert canonical(orm_respondents_by_ids(respondent_ids)) == canonical(get_respondent_by_ids(respondent_ids))
+            print(f'{args.count} businesses, {args.respondents} respondents each, {args.surveys} enrolments each '
+                  f'(best of {args.repeat} x {args.number})')
+            for name, orm, projected, ids in (('/businesses?id=', orm_businesses_by_ids, get_businesses_by_ids,
+                                               business_ids),
+                                              ('/respondents?id=', orm_respondents_by_ids, get_respondent_by_ids,
+                                               respondent_ids[:args.count])):
+                before = best_of(orm, ids, args.repeat, args.number)
+                after = best_of(projected, ids, args.repeat, args.number)
+                print(f'  {name:<17} ORM {before * 1000:8.2f} ms  projected {after * 1000:8.2f} ms  '
+                      f'speed up {before / after:5.1f}x')
+        finally:
+            current_app.db.session.remove()
+            app.db.execute(f'DROP SCHEMA {args.schema} CASCADE')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Gunicorn settings for running the service in production:
+
+    gunicorn -c gunicorn_config.py app:app
+
+Each worker is a gevent worker that serves up to GUNICORN_WORKER_CONNECTIONS requests at once, and has its own
+database pool.  A request only waits for a database connection (for up to DATABASE_POOL_TIMEOUT seconds) when more
+than DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW of the worker's requests are using the database at the same time, and
+the database sees up to GUNICORN_WORKERS * (DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW) connections per replica.
+
+The workers write their metrics to files in prometheus_multiproc_dir, so that /metrics, whichever worker serves it,
+reports the metrics of them all.
+"""
+import glob
+import os
+import tempfile
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 8081)}"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+# The app is loaded in each worker once it's been patched, rather than in the master, so requests, psycopg2 and the
+# pubsub client are only ever imported patched, and no database connections are shared between processes
+preload_app = False
+
+# Set before any worker is forked, as the metrics of a process are only shared if it's set when they're created.  The
+# metrics files of a previous run are removed on start up, so they aren't added to this one's.
+if os.getenv('prometheus_multiproc_dir'):
+    os.makedirs(os.environ['prometheus_multiproc_dir'], exist_ok=True)
+    for metrics_file in glob.glob(os.path.join(os.environ['prometheus_multiproc_dir'], '*.db')):
+        os.remove(metrics_file)
+else:
+    os.environ['prometheus_multiproc_dir'] = tempfile.mkdtemp(prefix='party-metrics-')
+
+
+def post_fork(server, worker):
+    """
+    Patches a gevent worker as soon as it's forked, before the app is loaded.  The worker would monkey patch itself,
+    but only later; psycopg2 and grpc (used by the pubsub client) aren't covered by monkey patching, so they need
+    their own hooks to yield to other greenlets while they wait on the network.
+    """
+    if server.cfg.worker_class_str != 'gevent':
+        return
+
+    from gevent import monkey
+    monkey.patch_all()
+
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+    from grpc.experimental import gevent as grpc_gevent
+    grpc_gevent.init_gevent()
+
+    server.log.info('Patched worker %s for gevent', worker.pid)
+
+
+def child_exit(server, worker):
+    """Stops counting an exited worker's live gauges, e.g. the database connections it had checked out"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,14 +1,56 @@
+import json
 import logging
 import os
+import random
 import sys
 
-from structlog import configure
+import orjson
+from structlog import DropEvent, configure
 from structlog.processors import JSONRenderer, TimeStamper, format_exc_info
 from structlog.stdlib import add_log_level, filter_by_level
 
 
+def sample_events(sample_rates):
+    """
+    Drops a fraction of the events of the levels in sample_rates (e.g. {'debug': 0.1} keeps a tenth of debug events),
+    for services whose debug and info events are too many to keep them all
+
+    :param sample_rates: A dict of the fraction of events of a level to keep, by level
+    """
+    def processor(logger, method_name, event_dict):  # pylint: disable=unused-argument
+        rate = sample_rates.get(method_name, 1)
+        if rate < 1 and random.random() >= rate:
+            raise DropEvent
+        return event_dict
+    return processor
+
+
+def truncate_values(max_items, max_length):
+    """
+    Shortens the large values bound to an event, e.g. a list of thousands of ids, to the first max_items items of a
+    list, tuple or set and the first max_length characters of a string, with a note of how many more there were
+    """
+    def processor(logger, method_name, event_dict):  # pylint: disable=unused-argument
+        for key, value in event_dict.items():
+            if key == 'event':
+                continue
+            if isinstance(value, (list, tuple, set, frozenset)) and len(value) > max_items:
+                event_dict[key] = list(value)[:max_items] + [f'... {len(value) - max_items} more']
+            elif isinstance(value, str) and len(value) > max_length:
+                event_dict[key] = f'{value[:max_length]}... {len(value) - max_length} more characters'
+        return event_dict
+    return processor
+
+
+def orjson_dumps(event_dict, **kwargs):  # pylint: disable=unused-argument
+    return orjson.dumps(event_dict, default=repr).decode()
+
+
 def logger_initial_config(log_level=None):
-    """Configures the logger"""
+    """
+    Configures the logger.  Events below the log level are dropped before any other processing, and the loggers are
+    cached on first use, so a disabled event costs little more than the call.
+    """
 
     service_name = 'ras-party'
     logger_format = "%(message)s"
@@ -22,6 +64,11 @@ def logger_initial_config(log_level=None):
     except (TypeError, ValueError):
         indent = None
 
+    sample_rates = {'debug': float(os.getenv('LOGGING_DEBUG_SAMPLE_RATE', 1)),
+                    'info': float(os.getenv('LOGGING_INFO_SAMPLE_RATE', 1))}
+    max_items = int(os.getenv('LOGGING_MAX_ITEMS', 20))
+    max_length = int(os.getenv('LOGGING_MAX_LENGTH', 1000))
+
     def add_service(logger, method_name, event_dict):  # pylint: disable=unused-argument
         """
         Add the service name to the event dict.
@@ -40,11 +87,17 @@ def logger_initial_config(log_level=None):
         event_dict["severity"] = method_name
         return event_dict
 
+    # orjson can't indent by an arbitrary amount, so indented logs (for reading locally) are still rendered by json
+    renderer = JSONRenderer(indent=indent, serializer=json.dumps) if indent else JSONRenderer(serializer=orjson_dumps)
+
     logging.basicConfig(stream=sys.stdout, level=log_level, format=logger_format)
-    configure(processors=[add_severity_level,
+    configure(processors=[filter_by_level,
+                          sample_events(sample_rates),
+                          add_severity_level,
                           add_log_level,
-                          filter_by_level,
                           add_service,
+                          truncate_values(max_items, max_length),
                           format_exc_info,
                           TimeStamper(fmt=logger_date_format, utc=True, key="created_at"),
-                          JSONRenderer(indent=indent)])
+                          renderer],
+              cache_logger_on_first_use=True)
@@ -11,7 +11,8 @@ from werkzeug.exceptions import BadRequest, Conflict, InternalServerError, NotFo
 
 from ras_party.clients.oauth_client import OauthClient
 from ras_party.controllers.case_controller import get_cases_for_casegroup, post_case_event
-from ras_party.controllers.iac_controller import disable_iac, request_iac
+from ras_party.controllers.iac_controller import cache_enrolment_code_context, cached_enrolment_code_context
+from ras_party.controllers.iac_controller import disable_iac, forget_enrolment_code_context, request_iac
 from ras_party.controllers.notify_gateway import NotifyGateway
 from ras_party.controllers.queries import count_enrolment_by_survey_business
 from ras_party.controllers.queries import query_business_respondent_by_respondent_id_and_business_id
@@ -24,12 +25,15 @@ from ras_party.controllers.validate import Exists, Validator
 from ras_party.exceptions import RasNotifyError
 from ras_party.models.models import BusinessRespondent, Enrolment, EnrolmentStatus
 from ras_party.models.models import PendingEnrolment, Respondent, RespondentStatus
+from ras_party.support.claims import forget_claims
+from ras_party.support.concurrency import submit
 from ras_party.support.public_website import PublicWebsite
 from ras_party.support.requests_wrapper import Requests
 from ras_party.support.session_decorator import with_db_session, with_query_only_db_session
 from ras_party.support.session_decorator import with_quiet_db_session
 from ras_party.support.transactional import transactional
-from ras_party.support.verification import decode_email_token
+from ras_party.support.verification import cache_verified_token, decode_email_token, forget_verified_tokens
+from ras_party.support.verification import token_digest, verified_token_cache
 from ras_party.support.util import obfuscate_email
 
 logger = structlog.wrap_logger(logging.getLogger(__name__))
@@ -66,24 +70,28 @@ def post_respondent(party, session):
         logger.debug(v.errors)
         raise BadRequest(v.errors)
 
-    iac = request_iac(party['enrolmentCode'])
-    if not iac.get('active'):
-        logger.info("Inactive enrolment code")
-        raise BadRequest("Enrolment code is not active")
+    # The email address is checked while the enrolment code and case are requested, and the business is looked up
+    # while the collection exercise is; the checks are still made in the same order as before.
+    lookups = {}
+
+    def check_email():
+        lookups['existing'] = query_respondent_by_email(party['emailAddress'].lower(), session)
 
-    existing = query_respondent_by_email(party['emailAddress'].lower(), session)
-    if existing:
-        logger.info("Email already exists", party_uuid=str(existing.party_uuid))
-        raise BadRequest("Email address already exists")
+    def look_up_business(case):
+        existing = lookups['existing']
+        if existing:
+            logger.info("Email already exists", party_uuid=str(existing.party_uuid))
+            raise BadRequest("Email address already exists")
+        lookups['business'] = query_business_by_party_uuid(case['partyId'], session)
 
-    case_context = request_case(party['enrolmentCode'])
-    case_id = case_context['id']
-    business_id = case_context['partyId']
-    collection_exercise_id = case_context['caseGroup']['collectionExerciseId']
-    collection_exercise = request_collection_exercise(collection_exercise_id)
-    survey_id = collection_exercise['surveyId']
+    context = get_enrolment_code_context(party['enrolmentCode'], meanwhile=check_email, with_case=look_up_business)
 
-    business = query_business_by_party_uuid(business_id, session)
+    case_id = context['case']['id']
+    business_id = context['case']['partyId']
+    collection_exercise_id = context['case']['caseGroup']['collectionExerciseId']
+    survey_id = context['collection_exercise']['surveyId']
+
+    business = lookups['business']
     if not business:
         logger.error("Could not locate business when creating business association",
                      business_id=business_id, case_id=case_id, collection_exercise_id=collection_exercise_id)
@@ -210,6 +218,7 @@ def _change_respondent_enrolment_status(respondent, survey_id, business_id, stat
                                                               survey_id=survey_id,
                                                               session=session)
     enrolment.status = status
+    forget_claims(respondent.party_uuid, business_id, survey_id)
     session.commit()  # Needs to be committed before call to case as that may look up party
 
     # If no enrolments are remaining for business/survey
@@ -297,6 +306,7 @@ def change_respondent(payload, session):
         raise Conflict("New email address already taken")
 
     respondent.pending_email_address = new_email_address
+    forget_verified_tokens(respondent.id)
 
     # check if respondent has initiated this request
     if 'change_requested_by_respondent' in payload:
@@ -315,11 +325,17 @@ def change_respondent(payload, session):
     return respondent.to_respondent_dict()
 
 
+def verify_token(token):
+    if verified_token_cache().get(token_digest(token)):
+        return {'response': "Ok"}
+    return _verify_token(token)
+
+
 @with_query_only_db_session
-def verify_token(token, session):
+def _verify_token(token, session):
     try:
         duration = current_app.config["EMAIL_TOKEN_EXPIRY"]
-        email_address = decode_email_token(token, duration)
+        email_address, signed_at = decode_email_token(token, duration, return_timestamp=True)
     except SignatureExpired:
         logger.info("Expired email verification token")
         raise Conflict("Expired email verification token")
@@ -332,6 +348,7 @@ def verify_token(token, session):
         logger.info("Respondent with Email from token does not exist")
         raise NotFound("Respondent does not exist")
 
+    cache_verified_token(token, email_address, respondent.id, signed_at, duration)
     return {'response': "Ok"}
 
 
@@ -501,6 +518,7 @@ def notify_change_account_status(payload, party_id, session):
         logger.info('Notification email successfully sent', party_id=party_id)
 
     respondent.status = status
+    forget_claims(respondent.party_uuid)
 
     return {'response': "Ok"}
 
@@ -551,6 +569,8 @@ def put_email_verification(token, tran, session):
             logger.info("Unable to find respondent by pending email")
             raise NotFound("Unable to find user while checking email verification token")
 
+    forget_verified_tokens(respondent.id)
+
     if respondent.status != RespondentStatus.ACTIVE:
         # We set the party as ACTIVE in this service
         respondent.status = RespondentStatus.ACTIVE
@@ -607,6 +627,7 @@ def update_verified_email_address(respondent, tran):
 
     respondent.email_address = new_email_address
     respondent.pending_email_address = None
+    forget_verified_tokens(respondent.id)
 
     tran.on_success(lambda: logger.info('Updated verified email address'))
 
@@ -703,18 +724,13 @@ def add_new_survey_for_respondent(payload, tran, session):
     respondent_party_id = payload['party_id']
     enrolment_code = payload['enrolment_code']
 
-    iac = request_iac(enrolment_code)
-    if not iac.get('active'):
-        logger.info("Inactive enrolment code")
-        raise BadRequest("Enrolment code is not active")
+    context = get_enrolment_code_context(enrolment_code)
 
     respondent = query_respondent_by_party_uuid(respondent_party_id, session)
-    case_context = request_case(enrolment_code)
-    case_id = case_context['id']
-    business_id = case_context['partyId']
-    collection_exercise_id = case_context['caseGroup']['collectionExerciseId']
-    collection_exercise = request_collection_exercise(collection_exercise_id)
-    survey_id = collection_exercise['surveyId']
+    case_id = context['case']['id']
+    business_id = context['case']['partyId']
+    collection_exercise_id = context['case']['caseGroup']['collectionExerciseId']
+    survey_id = context['collection_exercise']['surveyId']
 
     business_respondent = query_business_respondent_by_respondent_id_and_business_id(
         business_id, respondent.id, session)
@@ -838,6 +854,54 @@ def register_user(party):
     logger.info("New user has been registered via the oauth2-service")
 
 
+def get_enrolment_code_context(enrolment_code, meanwhile=None, with_case=None):
+    """
+    Gets the iac, case and collection exercise of an active enrolment code.  The iac and case are requested at the
+    same time.  The case and collection exercise are kept for the rest of the request (and for ENROLMENT_CODE_CACHE_TTL
+    seconds, if set), so a registration journey only resolves them once, but the iac is always requested, as the code
+    may have been used through another process since.
+
+    The caller's own work (e.g. database queries) can be overlapped with the requests rather than waiting for them.
+    It runs in the caller's thread, as the requests are already made on the executor, and it's still called when the
+    case and collection exercise are cached.
+
+    :param enrolment_code: A respondent provided enrolment code
+    :param meanwhile: Called with no arguments while the iac and case are requested
+    :param with_case: Called with the case, once the enrolment code is known to be active, while the collection
+                      exercise is requested
+    :return: A dict of the code's iac, case and collection_exercise
+    :raises BadRequest: Raised if the enrolment code isn't active
+    """
+    cached = cached_enrolment_code_context(enrolment_code)
+    iac_request = submit(request_iac, enrolment_code)
+    case_request = None if cached else submit(request_case, enrolment_code)
+    if meanwhile:
+        meanwhile()
+
+    iac = iac_request.result()
+    if not iac.get('active'):
+        logger.info("Inactive enrolment code")
+        forget_enrolment_code_context(enrolment_code)
+        raise BadRequest("Enrolment code is not active")
+
+    if cached:
+        if with_case:
+            with_case(cached['case'])
+        return dict(cached, iac=iac)
+
+    case = case_request.result()
+    collection_exercise_request = submit(request_collection_exercise, case['caseGroup']['collectionExerciseId'])
+    if with_case:
+        with_case(case)
+
+    context = {
+        'case': case,
+        'collection_exercise': collection_exercise_request.result()
+    }
+    cache_enrolment_code_context(enrolment_code, context)
+    return dict(context, iac=iac)
+
+
 def request_case(enrolment_code):
     """
     Contact the case service to retrieve a case for a given enrolment code
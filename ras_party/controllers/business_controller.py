@@ -1,20 +1,41 @@
+import json
 import uuid
 import logging
+from collections import defaultdict
 
 import structlog
 from flask import current_app
 from werkzeug.exceptions import BadRequest, NotFound
 
 from ras_party.controllers.queries import query_business_by_ref, query_business_by_party_uuid, \
-    query_businesses_by_party_uuids, search_businesses, query_business_attributes, \
-    query_business_attributes_by_collection_exercise
+    search_businesses, query_business_attributes, \
+    query_business_attributes_by_collection_exercise, query_businesses_by_refs, \
+    query_business_attribute_ids_to_link, update_business_attributes_collection_exercise, \
+    count_business_attributes_linked_by_sample, query_business_rows_by_party_uuids, \
+    query_active_business_attribute_rows, query_respondent_association_rows_by_business_ids, \
+    query_business_party_rows_by_refs, query_active_business_attribute_ids_by_refs
 from ras_party.controllers.validate import Validator, Exists
-from ras_party.models.models import Business, BusinessAttributes
-from ras_party.support.session_decorator import with_db_session, with_query_only_db_session
+from ras_party.models.models import Business
+from ras_party.support.cache import app_cache
+from ras_party.support.session_decorator import with_bulk_db_session, with_db_session, with_query_only_db_session
 
 
 logger = structlog.wrap_logger(logging.getLogger(__name__))
 
+MAX_REPORTED_INGEST_ERRORS = 100
+
+
+def business_by_ref_cache():
+    """
+    The cache of business party dicts, keyed by business ref, along with the id of the active attributes each was
+    built from as its version.  Sample unit resolution looks the same businesses up by reference again and again, so a
+    hit only has to check its version is still current (which also catches changes made through other processes)
+    rather than load the business, its attributes and its respondents again.
+
+    :rtype: TTLCache
+    """
+    return app_cache('businesses_by_ref', 'BUSINESS_REF_CACHE_TTL')
+
 
 @with_query_only_db_session
 def get_business_by_ref(ref, session):
@@ -26,12 +47,68 @@ def get_business_by_ref(ref, session):
     :returns: A business object containing the data for the business
     :rtype: Business
     """
-    business = query_business_by_ref(ref, session)
-    if not business:
+    businesses = _party_dicts_by_refs([ref], session, skip_inactive=False)
+    if ref not in businesses:
         logger.info("Business with reference does not exist.", ru_ref=ref)
         raise NotFound("Business with reference does not exist.")
 
-    return business.to_party_dict()
+    return businesses[ref]
+
+
+@with_query_only_db_session
+def get_businesses_by_refs(refs, session):
+    """
+    Get a list of businesses by business reference, in a fixed number of queries however many there are.  References
+    of businesses that don't exist or have no active attributes are left out.
+
+    :param refs: A list of business references
+    :param session: A database session
+    :returns: A list of businesses, in the order of their references
+    :raises BadRequest: Raised if refs isn't a list of strings
+    """
+    if not isinstance(refs, list) or not all(isinstance(ref, str) for ref in refs):
+        logger.info("Business references aren't a list of strings")
+        raise BadRequest("The business references must be a list of strings")
+
+    businesses = _party_dicts_by_refs(refs, session)
+    return [businesses[ref] for ref in dict.fromkeys(refs) if ref in businesses]
+
+
+def _party_dicts_by_refs(refs, session, skip_inactive=True):
+    """
+    Resolve businesses by reference to their party dicts, from the cache where the cached version is still current and
+    from the database for the rest
+
+    :param refs: A collection of business references
+    :param session: A database session
+    :param skip_inactive: Leave out businesses with no active attributes, rather than raise NotFound
+    :return: A dict of party dict by business reference, without the references of businesses that don't exist
+    """
+    cache = business_by_ref_cache()
+    businesses = {}
+    cached = {ref: entry for ref, entry in ((ref, cache.get(ref)) for ref in set(refs)) if entry is not None}
+    if cached:
+        versions = {row.business_ref: row.attributes_id
+                    for row in query_active_business_attribute_ids_by_refs(list(cached), session)}
+        businesses = {ref: party for ref, (version, party) in cached.items() if versions.get(ref) == version}
+
+    missed = [ref for ref in set(refs) if ref not in businesses]
+    if not missed:
+        return businesses
+
+    rows = query_business_party_rows_by_refs(missed, session).all()
+    if skip_inactive:
+        rows = [row for row in rows if row.attributes_id is not None]
+    associations = defaultdict(list)
+    active_ids = [row.party_uuid for row in rows if row.attributes_id is not None]
+    if active_ids:
+        for row in query_respondent_association_rows_by_business_ids(active_ids, session):
+            associations[row.business_id].append(row)
+
+    for row in rows:
+        party = businesses[row.business_ref] = Business.party_dict_from_rows(row, associations[row.party_uuid])
+        cache.set(row.business_ref, (row.attributes_id, party))
+    return businesses
 
 
 @with_query_only_db_session
@@ -51,8 +128,20 @@ def get_businesses_by_ids(party_uuids, session):
             logger.info("Invalid party uuid value", party_uuid=party_uuid)
             raise BadRequest(f"'{party_uuid}' is not a valid UUID format for property 'id'")
 
-    businesses = query_businesses_by_party_uuids(party_uuids, session)
-    return [business.to_business_summary_dict() for business in businesses]
+    businesses = query_business_rows_by_party_uuids(party_uuids, session).all()
+    if not businesses:
+        return []
+
+    business_ids = [business.party_uuid for business in businesses]
+    attributes = {row.business_id: row for row in query_active_business_attribute_rows(business_ids, session)}
+    associations = defaultdict(list)
+    for row in query_respondent_association_rows_by_business_ids(business_ids, session):
+        associations[row.business_id].append(row)
+
+    return [Business.summary_dict_from_rows(business,
+                                            attributes.get(business.party_uuid),
+                                            associations[business.party_uuid])
+            for business in businesses]
 
 
 @with_query_only_db_session
@@ -149,17 +238,117 @@ def businesses_post(business_data, session):
     else:
         business = Business.from_party_dict(party_data)
         session.add(business)
+    business_by_ref_cache().pop(party_data['sampleUnitRef'])
     return business.to_post_response_dict()
 
 
-@with_db_session
-def businesses_sample_ce_link(sample, ce_data, session):
+def businesses_post_stream(stream):
+    """
+    Create or update businesses from a stream of newline delimited JSON, where each line is a business in the same
+    format accepted by businesses_post.  Rows are validated as they are read and written to the database in fixed
+    size chunks, with each chunk committed in its own session, so memory use doesn't grow with the size of the sample.
+
+    Rows that fail to parse or validate are rejected and reported (up to MAX_REPORTED_INGEST_ERRORS of them) rather
+    than aborting the whole ingest, as earlier chunks will already have been committed.
+
+    :param stream: A file-like object yielding one JSON document per line (typically request.stream)
+    :return: A dict of progress counters for the ingest and any errors for rejected rows
+    :rtype: dict
+    """
+    chunk_size = int(current_app.config['BUSINESS_INGEST_CHUNK_SIZE'])
+    schema = current_app.config['PARTY_SCHEMA']
+    fast_validation = current_app.config['BUSINESS_INGEST_FAST_VALIDATION']
+    progress = {'received': 0, 'created': 0, 'updated': 0, 'rejected': 0, 'chunks': 0}
+    errors = []
+    chunk = []
+
+    logger.info("Starting streaming business ingest", chunk_size=chunk_size)
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        progress['received'] += 1
+
+        try:
+            business_data = json.loads(line)
+        except ValueError:
+            business_data = None
+
+        if isinstance(business_data, dict):
+            party_data = Business.to_party(business_data)
+            row_errors = Business.validate(party_data, schema, fast=fast_validation)
+        else:
+            row_errors = ['Line is not a valid JSON object']
+
+        if row_errors:
+            progress['rejected'] += 1
+            if len(errors) < MAX_REPORTED_INGEST_ERRORS:
+                errors.append({'line': line_number, 'errors': [e.split('\n')[0] for e in row_errors]})
+            continue
+
+        chunk.append(party_data)
+        if len(chunk) >= chunk_size:
+            _flush_business_chunk(chunk, progress)
+            chunk = []
+
+    if chunk:
+        _flush_business_chunk(chunk, progress)
+
+    logger.info("Completed streaming business ingest", **progress)
+    return dict(progress, errors=errors)
+
+
+def _flush_business_chunk(chunk, progress):
+    # with_bulk_db_session function wrapper automatically injects the session parameter
+    # pylint: disable=no-value-for-parameter
+    created, updated = _save_business_chunk(chunk)
+    progress['created'] += created
+    progress['updated'] += updated
+    progress['chunks'] += 1
+    logger.info("Committed business ingest chunk", **progress)
+
+
+@with_bulk_db_session
+def _save_business_chunk(chunk, session):
+    """
+    Create or add versioned attributes to the businesses in a chunk, resolving all the existing businesses in a single
+    query rather than once per row.
+
+    :param chunk: A list of party dicts that have already passed validation
+    :param session: database session.
+    :return: A tuple of the number of businesses created and the number updated
+    """
+    businesses = {business.business_ref: business
+                  for business in query_businesses_by_refs({party['sampleUnitRef'] for party in chunk}, session)}
+    names_and_trading_as = [Business.name_and_trading_as(party.get('attributes')) for party in chunk]
+    created = updated = 0
+    for party_data, name_and_trading_as in zip(chunk, names_and_trading_as):
+        business = businesses.get(party_data['sampleUnitRef'])
+        if business:
+            party_data['id'] = str(business.party_uuid)
+            business.add_versioned_attributes(party_data, name_and_trading_as)
+            updated += 1
+        else:
+            business = Business.from_party_dict(party_data, name_and_trading_as)
+            session.add(business)
+            businesses[business.business_ref] = business
+            created += 1
+    cache = business_by_ref_cache()
+    for party_data in chunk:
+        cache.pop(party_data['sampleUnitRef'])
+    return created, updated
+
+
+def businesses_sample_ce_link(sample, ce_data):
     """
     Update business versions to have the correct collection exercise and sample link.
 
+    The business attributes are linked in chunks of SAMPLE_LINK_CHUNK_SIZE, paged by id and each committed in its own
+    session, so a large sample isn't rewritten in a single long transaction.  Only rows not already linked to the
+    collection exercise are updated, so if the link is interrupted it can be resumed by making the same request again.
+
     :param sample: the sample summary id to update.
     :param ce_data: dictionary containing the collectionExerciseId to link with sample.
-    :param session: database session.
+    :return: A dict with the number of business attributes linked and the number of chunks committed
     """
 
     v = Validator(Exists('collectionExerciseId'))
@@ -168,9 +357,62 @@ def businesses_sample_ce_link(sample, ce_data, session):
         raise BadRequest(v.errors)
 
     collection_exercise_id = ce_data['collectionExerciseId']
+    chunk_size = int(current_app.config['SAMPLE_LINK_CHUNK_SIZE'])
+    bound_logger = logger.bind(sample_summary_id=sample, collection_exercise_id=collection_exercise_id)
+
+    progress = {'linked': 0, 'chunks': 0}
+    last_id = 0
+    while True:
+        # with_bulk_db_session function wrapper automatically injects the session parameter
+        # pylint: disable=no-value-for-parameter
+        last_id, linked = _link_sample_chunk(sample, collection_exercise_id, last_id, chunk_size)
+        if last_id is None:
+            break
+        progress['linked'] += linked
+        progress['chunks'] += 1
+        bound_logger.info("Committed sample link chunk", last_id=last_id, **progress)
+
+    if progress['linked']:
+        # Any of the cached businesses could be in the sample, and linking it changes their active attributes
+        business_by_ref_cache().clear()
+    bound_logger.info("Completed linking sample to collection exercise", **progress)
+    return progress
+
+
+@with_bulk_db_session
+def _link_sample_chunk(sample, collection_exercise_id, after_id, chunk_size, session):
+    """
+    Link the next chunk of a sample's business attributes to a collection exercise.
+
+    :return: A tuple of the last business attributes id in the chunk (None if there was nothing left to link) and the
+             number of rows linked
+    """
+    ids = query_business_attribute_ids_to_link(sample, collection_exercise_id, after_id, chunk_size, session)
+    if not ids:
+        return None, 0
 
-    session.query(BusinessAttributes).filter(BusinessAttributes.sample_summary_id == sample)\
-        .update({'collection_exercise': collection_exercise_id})
+    linked = update_business_attributes_collection_exercise(sample, collection_exercise_id, ids[0], ids[-1], session)
+    return ids[-1], linked
+
+
+@with_query_only_db_session
+def get_sample_link_progress(sample, session, collection_exercise_id=None):
+    """
+    Get how many of the business attributes for a sample are linked to a collection exercise, so the progress of
+    businesses_sample_ce_link can be followed.
+
+    :param sample: the sample summary id.
+    :param session: database session.
+    :param collection_exercise_id: the collection exercise id, if not supplied any link is counted.
+    :return: A dict with the total number of business attributes for the sample and the number linked
+    """
+    total, linked = count_business_attributes_linked_by_sample(sample, collection_exercise_id, session)
+    return {
+        'sampleSummaryId': sample,
+        'collectionExerciseId': collection_exercise_id,
+        'total': total,
+        'linked': linked
+    }
 
 
 @with_query_only_db_session
@@ -3,8 +3,9 @@ import logging
 import requests
 import structlog
 
-from flask import current_app
+from flask import current_app, g
 
+from ras_party.support.cache import app_cache
 from ras_party.support.requests_wrapper import Requests
 
 logger = structlog.wrap_logger(logging.getLogger(__name__))
@@ -17,6 +18,30 @@ def request_iac(enrolment_code):
     return response.json()
 
 
+def cached_enrolment_code_context(enrolment_code):
+    """
+    Gets the case and collection exercise of an enrolment code resolved earlier in the request, or cached by another
+    request.  The iac isn't kept, as whether the code is still active has to be checked with the iac service each time.
+
+    :param enrolment_code: A string containing the code
+    :return: A dict of the case and collection_exercise, or None
+    """
+    context = g.get('enrolment_code_contexts', {}).get(enrolment_code)
+    if context is None:
+        context = app_cache('enrolment_code_contexts', 'ENROLMENT_CODE_CACHE_TTL').get(enrolment_code)
+    return context
+
+
+def cache_enrolment_code_context(enrolment_code, context):
+    g.setdefault('enrolment_code_contexts', {})[enrolment_code] = context
+    app_cache('enrolment_code_contexts', 'ENROLMENT_CODE_CACHE_TTL').set(enrolment_code, context)
+
+
+def forget_enrolment_code_context(enrolment_code):
+    g.get('enrolment_code_contexts', {}).pop(enrolment_code, None)
+    app_cache('enrolment_code_contexts', 'ENROLMENT_CODE_CACHE_TTL').pop(enrolment_code)
+
+
 def disable_iac(enrolment_code, case_id):
     """
     Disables the iac code by calling the iac service
@@ -26,6 +51,7 @@ def disable_iac(enrolment_code, case_id):
     :returns:  A dictionary containing the json response from the call
     :raises ValueError:  Raised when the response doesn't return json (on a 500 response?)
     """
+    forget_enrolment_code_context(enrolment_code)
     iac_url = f'{current_app.config["IAC_URL"]}/iacs/{enrolment_code}'
     payload = {
         "updatedBy": "Party Service"
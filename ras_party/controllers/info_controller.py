@@ -3,6 +3,8 @@ from pathlib import Path
 
 from flask import current_app
 
+from ras_party.support.circuit_breaker import circuit_breakers
+from ras_party.support.db_pool import InstrumentedQueuePool
 
 _health_check = {}
 
@@ -17,4 +19,14 @@ def get_info():
         "version": current_app.config['VERSION'],
     }
     info = dict(_health_check, **info)
+
+    engine = getattr(current_app, 'db', None)
+    for key, pool in (('databasePool', getattr(engine, 'pool', None)),
+                      ('databaseReplicaPool', getattr(getattr(engine, 'replica_engine', None), 'pool', None))):
+        if isinstance(pool, InstrumentedQueuePool):
+            info[key] = pool.stats()
+
+    breakers = circuit_breakers()
+    if breakers:
+        info['downstreamServices'] = {name: breaker.stats() for name, breaker in list(breakers.items())}
     return info
@@ -1,11 +1,13 @@
 import json
 import logging
+import time
 from concurrent.futures import TimeoutError
 
 import structlog
 from google.cloud import pubsub_v1
 
 from ras_party.exceptions import RasNotifyError
+from ras_party.support.metrics import NOTIFY_PUBLISH_DURATION
 
 logger = structlog.wrap_logger(logging.getLogger(__name__))
 
@@ -61,17 +63,21 @@ class NotifyGateway:
         topic_path = self.publisher.topic_path(self.project_id, self.topic_id)
 
         bound_logger.info("About to publish to pubsub")
+        start = time.perf_counter()
         future = self.publisher.publish(topic_path, data=payload_str.encode())
 
         # It's okay for us to catch a broad Exception here because the documentation for future.result() says it
         # throws either a TimeoutError or an Exception.
         try:
             msg_id = future.result()
+            NOTIFY_PUBLISH_DURATION.labels('success').observe(time.perf_counter() - start)
             bound_logger.info("Publish succeeded", msg_id=msg_id)
         except TimeoutError as e:
+            NOTIFY_PUBLISH_DURATION.labels('timeout').observe(time.perf_counter() - start)
             bound_logger.error("Publish to pubsub timed out", exc_info=True)
             raise RasNotifyError("Publish to pubsub timed out", error=e)
         except Exception as e: # noqa
+            NOTIFY_PUBLISH_DURATION.labels('error').observe(time.perf_counter() - start)
             bound_logger.error("A non-timeout error was raised when publishing to pubsub", exc_info=True)
             raise RasNotifyError("A non-timeout error was raised when publishing to pubsub", error=e)
 
@@ -4,9 +4,11 @@ import structlog
 from flask import current_app
 from werkzeug.exceptions import BadRequest, NotFound
 
+from ras_party.controllers.business_controller import business_by_ref_cache
 from ras_party.controllers.queries import query_business_by_party_uuid, query_business_by_ref
-from ras_party.controllers.queries import query_respondent_by_party_uuid
-from ras_party.models.models import Business, Respondent
+from ras_party.controllers.queries import query_business_enrolment_rows, query_respondent_by_party_uuid
+from ras_party.controllers.queries import query_respondent_enrolment_rows
+from ras_party.models.models import Business, EnrolmentStatus, Respondent, enrolled_associations_from_rows
 from ras_party.support.session_decorator import with_db_session, with_query_only_db_session
 
 
@@ -39,6 +41,7 @@ def parties_post(party_data, session):
     else:
         business = Business.from_party_dict(party_data)
         session.add(business)
+    business_by_ref_cache().pop(party_data['sampleUnitRef'])
     return business.to_post_response_dict()
 
 
@@ -70,33 +73,40 @@ def get_party_by_id(sample_unit_type, party_id, session):
         raise BadRequest(f"{sample_unit_type} is not a valid value for sampleUnitType. Must be one of ['B', 'BI']")
 
 
-def get_party_with_enrolments_filtered_by_survey(sample_unit_type, party_id, survey_id, enrolment_status=None):
-    party = get_party_by_id(sample_unit_type, party_id)
-
-    filtered_associations = []
-    for association in party['associations']:
-
-        filtered_association = {'partyId': association['partyId']}
-
-        filtered_enrolments = filter_enrolments(association['enrolments'], survey_id, enrolment_status)
-
-        if filtered_enrolments:
-            filtered_association['enrolments'] = filtered_enrolments
-            filtered_associations.append(filtered_association)
-
-    party['associations'] = filtered_associations
-
-    return party
-
-
-def filter_enrolments(existing_enrolments, survey_id, enrolment_status=None):
-    filtered_enrolments = []
-    for enrolment in existing_enrolments:
-        if enrolment['surveyId'] == survey_id:
-            filtered_enrolments.append(enrolment)
+@with_query_only_db_session
+def get_party_with_enrolments_filtered_by_survey(sample_unit_type, party_id, survey_id, enrolment_status, session):
+    """
+    Get a party by its party_id, with only its associations that have enrolments on a survey (and only those
+    enrolments).  The filtering is done in the query, so parties enrolled on many surveys don't load them all.
 
+    :param sample_unit_type: Type of the party
+    :param party_id: uuid identifier of the party
+    :param survey_id: The survey the enrolments must be for
+    :param enrolment_status: A list of enrolment status names the enrolments must have, or empty for any status
+    :raises BadRequest: Raised if the sample_unit_type is not recognised
+    :raises NotFound: Raised if the party_id doesn't match one in the database
+    """
+    enrolment_statuses = None
     if enrolment_status:
-        for enrolment in filtered_enrolments:
-            if enrolment['enrolmentStatus'] not in enrolment_status:
-                filtered_enrolments.remove(enrolment)
-    return filtered_enrolments
+        enrolment_statuses = [EnrolmentStatus[status] for status in enrolment_status
+                              if status in EnrolmentStatus.__members__]
+
+    if sample_unit_type == Business.UNIT_TYPE:
+        business = query_business_by_party_uuid(party_id, session)
+        if not business:
+            logger.info("Business with id does not exist", business_id=party_id, status=404)
+            raise NotFound("Business with id does not exist")
+        rows = query_respondent_enrolment_rows(business.party_uuid, survey_id, enrolment_statuses, session) \
+            if enrolment_statuses != [] else []
+        return business.to_party_dict(associations=enrolled_associations_from_rows(rows))
+    elif sample_unit_type == Respondent.UNIT_TYPE:
+        respondent = query_respondent_by_party_uuid(party_id, session)
+        if not respondent:
+            logger.info("Respondent with id does not exist", respondent_id=party_id, status=404)
+            raise NotFound("Respondent with id does not exist")
+        rows = query_business_enrolment_rows(respondent.id, survey_id, enrolment_statuses, session) \
+            if enrolment_statuses != [] else []
+        return respondent.to_party_dict(associations=enrolled_associations_from_rows(rows))
+    else:
+        logger.info("Invalid sample unit type", type=sample_unit_type)
+        raise BadRequest(f"{sample_unit_type} is not a valid value for sampleUnitType. Must be one of ['B', 'BI']")
@@ -1,7 +1,7 @@
 import logging
 
 import structlog
-from sqlalchemy import func, and_, or_, distinct
+from sqlalchemy import func, and_, or_, distinct, case, exists
 
 from ras_party.models.models import Business, BusinessAttributes, BusinessRespondent, \
     Enrolment, EnrolmentStatus, Respondent, PendingShares
@@ -18,7 +18,7 @@ def query_enrolment_by_business_and_survey_and_status(business_id, survey_id, se
     :param session: db session
     :return: the enrolment
     """
-    logger.info('Querying enrolment by business_id and survey_id', business_id=business_id, survey_id=survey_id)
+    logger.debug('Querying enrolment by business_id and survey_id', business_id=business_id, survey_id=survey_id)
     return session.query(Enrolment).filter(
         Enrolment.business_id == business_id).filter(
         Enrolment.survey_id == survey_id).filter(or_(Enrolment.status == EnrolmentStatus.ENABLED,
@@ -33,7 +33,7 @@ def query_pending_shares_by_business_and_survey(business_id, survey_id, session)
     :param session: db session
     :return: the pending share
     """
-    logger.info('Querying pending share by business_id and survey_id', business_id=business_id, survey_id=survey_id)
+    logger.debug('Querying pending share by business_id and survey_id', business_id=business_id, survey_id=survey_id)
     return session.query(PendingShares).filter(
         PendingShares.business_id == business_id).filter(PendingShares.survey_id == survey_id)
 
@@ -45,10 +45,105 @@ def query_businesses_by_party_uuids(party_uuids, session):
     :param party_uuids: a list of party uuids
     :return: the businesses
     """
-    logger.info('Querying businesses by party_uuids', party_uuids=party_uuids)
+    logger.debug('Querying businesses by party_uuids', party_uuids=party_uuids)
     return session.query(Business).filter(Business.party_uuid.in_(party_uuids))
 
 
+def query_business_rows_by_party_uuids(party_uuids, session):
+    """
+    Query to return the id and reference of businesses based on party uuids, as rows rather than Business instances
+
+    :param party_uuids: a list of party uuids
+    :return: rows of party_uuid and business_ref
+    """
+    logger.debug('Querying business rows by party_uuids', party_uuids=party_uuids)
+    return session.query(Business.party_uuid, Business.business_ref).filter(Business.party_uuid.in_(party_uuids))
+
+
+def query_active_business_attribute_rows(business_ids, session):
+    """
+    Query to return the most recent attributes linked to a collection exercise for each of the businesses, with only
+    the columns needed for a business summary
+
+    :param business_ids: a list of business party uuids
+    :return: rows of business_id, sample_summary_id, name and trading_as
+    """
+    logger.debug('Querying active business attribute rows', business_ids=business_ids)
+    return session.query(BusinessAttributes.business_id,
+                         BusinessAttributes.sample_summary_id,
+                         BusinessAttributes.attributes['name'].astext.label('name'),
+                         BusinessAttributes.attributes['trading_as'].astext.label('trading_as')) \
+        .filter(BusinessAttributes.business_id.in_(business_ids)) \
+        .filter(BusinessAttributes.collection_exercise.isnot(None)) \
+        .filter(BusinessAttributes.collection_exercise != '') \
+        .distinct(BusinessAttributes.business_id) \
+        .order_by(BusinessAttributes.business_id, BusinessAttributes.created_on.desc())
+
+
+def _active_attributes_join():
+    return and_(BusinessAttributes.business_id == Business.party_uuid,
+                BusinessAttributes.collection_exercise.isnot(None),
+                BusinessAttributes.collection_exercise != '')
+
+
+def query_business_party_rows_by_refs(business_refs, session):
+    """
+    Query to return businesses by reference along with their most recent attributes linked to a collection exercise,
+    with the columns needed for a party dict, as rows rather than Business instances.  A business with no active
+    attributes has a row with an attributes_id of None.
+
+    :param business_refs: a collection of business refs
+    :return: rows of party_uuid, business_ref, attributes_id, sample_summary_id and attributes
+    """
+    logger.debug('Querying business party rows by business_refs', business_ref_count=len(business_refs))
+    return session.query(Business.party_uuid,
+                         Business.business_ref,
+                         BusinessAttributes.id.label('attributes_id'),
+                         BusinessAttributes.sample_summary_id,
+                         BusinessAttributes.attributes) \
+        .outerjoin(BusinessAttributes, _active_attributes_join()) \
+        .filter(Business.business_ref.in_(business_refs)) \
+        .distinct(Business.party_uuid) \
+        .order_by(Business.party_uuid, BusinessAttributes.created_on.desc())
+
+
+def query_active_business_attribute_ids_by_refs(business_refs, session):
+    """
+    Query to return the id of the most recent attributes linked to a collection exercise for each of the businesses,
+    which changes whenever a business' party dict would (other than its associations)
+
+    :param business_refs: a collection of business refs
+    :return: rows of business_ref and attributes_id
+    """
+    logger.debug('Querying active business attribute ids by business_refs', business_ref_count=len(business_refs))
+    return session.query(Business.business_ref,
+                         BusinessAttributes.id.label('attributes_id')) \
+        .join(BusinessAttributes, _active_attributes_join()) \
+        .filter(Business.business_ref.in_(business_refs)) \
+        .distinct(Business.party_uuid) \
+        .order_by(Business.party_uuid, BusinessAttributes.created_on.desc())
+
+
+def query_respondent_association_rows_by_business_ids(business_ids, session):
+    """
+    Query to return the respondents associated with businesses along with their enrolments, one row per enrolment (or
+    a single row with no enrolment for a respondent that isn't enrolled on anything)
+
+    :param business_ids: a list of business party uuids
+    :return: rows of business_id, respondent party_uuid, respondent_status, survey_id and enrolment_status
+    """
+    logger.debug('Querying respondent association rows by business_ids', business_ids=business_ids)
+    return session.query(BusinessRespondent.business_id,
+                         Respondent.party_uuid,
+                         Respondent.status.label('respondent_status'),
+                         Enrolment.survey_id,
+                         Enrolment.status.label('enrolment_status')) \
+        .join(Respondent, Respondent.id == BusinessRespondent.respondent_id) \
+        .outerjoin(Enrolment, and_(Enrolment.business_id == BusinessRespondent.business_id,
+                                   Enrolment.respondent_id == BusinessRespondent.respondent_id)) \
+        .filter(BusinessRespondent.business_id.in_(business_ids))
+
+
 def query_business_by_party_uuid(party_uuid, session):
     """
     Query to return business based on party uuid
@@ -57,7 +152,7 @@ def query_business_by_party_uuid(party_uuid, session):
     :return: business or none
     :rtype: Business
     """
-    logger.info('Querying businesses by party_uuid', party_uuid=party_uuid)
+    logger.debug('Querying businesses by party_uuid', party_uuid=party_uuid)
 
     return session.query(Business).filter(Business.party_uuid == party_uuid).first()
 
@@ -69,11 +164,25 @@ def query_business_by_ref(business_ref, session):
     :return: business or none
     :rtype: Business
     """
-    logger.info('Querying businesses by business_ref', business_ref=business_ref)
+    logger.debug('Querying businesses by business_ref', business_ref=business_ref)
 
     return session.query(Business).filter(Business.business_ref == business_ref).first()
 
 
+def query_businesses_by_refs(business_refs, session):
+    """
+    Query to return businesses based on a collection of business refs
+
+    :param business_refs: a collection of business refs
+    :param session: A database session
+    :return: the businesses
+    :rtype: list of Business
+    """
+    logger.debug('Querying businesses by business_refs', business_ref_count=len(business_refs))
+
+    return session.query(Business).filter(Business.business_ref.in_(business_refs)).all()
+
+
 def query_business_attributes(business_id, session):
     """
     Query to return all business attributes records based
@@ -83,7 +192,7 @@ def query_business_attributes(business_id, session):
     :return: A list of businessAttributes that match the id
     :rtype: list of BusinessAttributes
     """
-    logger.info('Querying business attributes by id', business_id=business_id)
+    logger.debug('Querying business attributes by id', business_id=business_id)
 
     return session.query(BusinessAttributes).filter(BusinessAttributes.business_id == business_id).all()
 
@@ -98,13 +207,82 @@ def query_business_attributes_by_collection_exercise(business_id, collection_exe
     :return: A list of businessAttributes that match the query parameters
     :rtype: list of BusinessAttributes
     """
-    logger.info('Querying business attributes by id and collection exercise', business_id=business_id,
-                collection_exercise_uuids=collection_exercise_uuids)
+    logger.debug('Querying business attributes by id and collection exercise', business_id=business_id,
+                 collection_exercise_uuids=collection_exercise_uuids)
     conditions = [BusinessAttributes.business_id == business_id,
                   BusinessAttributes.collection_exercise.in_(collection_exercise_uuids)]
     return session.query(BusinessAttributes).filter(and_(*conditions)).all()
 
 
+def query_business_attribute_ids_to_link(sample_summary_id, collection_exercise_id, after_id, limit, session):
+    """
+    Query to return the next chunk of business attributes ids for a sample that aren't yet linked to the collection
+    exercise, in id order.  Paging by id rather than offset keeps each chunk an index range scan.
+
+    :param sample_summary_id: the sample summary id
+    :param collection_exercise_id: the collection exercise id being linked
+    :param after_id: only return ids greater than this one
+    :param limit: the maximum number of ids to return
+    :param session: A database session
+    :return: A list of business attributes ids
+    :rtype: list of int
+    """
+    logger.debug('Querying business attributes to link to collection exercise', sample_summary_id=sample_summary_id,
+                 collection_exercise_id=collection_exercise_id, after_id=after_id)
+
+    rows = session.query(BusinessAttributes.id) \
+        .filter(BusinessAttributes.sample_summary_id == sample_summary_id,
+                BusinessAttributes.id > after_id,
+                BusinessAttributes.collection_exercise.is_distinct_from(collection_exercise_id)) \
+        .order_by(BusinessAttributes.id).limit(limit).all()
+    return [row.id for row in rows]
+
+
+def update_business_attributes_collection_exercise(sample_summary_id, collection_exercise_id, first_id, last_id,
+                                                   session):
+    """
+    Links the business attributes for a sample, within an id range, to a collection exercise.  Rows already linked
+    to the collection exercise are left alone, so the update can safely be repeated.
+
+    :param sample_summary_id: the sample summary id
+    :param collection_exercise_id: the collection exercise id to link
+    :param first_id: the first business attributes id in the range
+    :param last_id: the last business attributes id in the range
+    :param session: A database session
+    :return: the number of rows updated
+    :rtype: int
+    """
+    logger.info('Linking business attributes to collection exercise', sample_summary_id=sample_summary_id,
+                collection_exercise_id=collection_exercise_id, first_id=first_id, last_id=last_id)
+
+    return session.query(BusinessAttributes) \
+        .filter(BusinessAttributes.sample_summary_id == sample_summary_id,
+                BusinessAttributes.id.between(first_id, last_id),
+                BusinessAttributes.collection_exercise.is_distinct_from(collection_exercise_id)) \
+        .update({'collection_exercise': collection_exercise_id}, synchronize_session=False)
+
+
+def count_business_attributes_linked_by_sample(sample_summary_id, collection_exercise_id, session):
+    """
+    Query to count the business attributes for a sample, and how many of them are linked to a collection exercise
+
+    :param sample_summary_id: the sample summary id
+    :param collection_exercise_id: the collection exercise id, if None any collection exercise is counted as linked
+    :param session: A database session
+    :return: A tuple of the total number of business attributes and the number linked
+    """
+    logger.debug('Counting linked business attributes for sample', sample_summary_id=sample_summary_id,
+                 collection_exercise_id=collection_exercise_id)
+
+    if collection_exercise_id:
+        linked = func.count(case([(BusinessAttributes.collection_exercise == collection_exercise_id, 1)]))
+    else:
+        linked = func.count(BusinessAttributes.collection_exercise)
+
+    return session.query(func.count(BusinessAttributes.id), linked) \
+        .filter(BusinessAttributes.sample_summary_id == sample_summary_id).one()
+
+
 def query_respondent_by_party_uuids(party_uuids, session):
     """
     Query to return respondents based on party uuids
@@ -112,10 +290,109 @@ def query_respondent_by_party_uuids(party_uuids, session):
     :param party_uuids: the party uuids
     :return: respondents or empty list
     """
-    logger.info('Querying respondents by party_uuids', party_uuids=party_uuids)
+    logger.debug('Querying respondents by party_uuids', party_uuids=party_uuids)
     return session.query(Respondent).filter(Respondent.party_uuid.in_(party_uuids))
 
 
+def query_respondent_rows_by_party_uuids(party_uuids, session):
+    """
+    Query to return respondents based on party uuids, as rows of the columns needed for a respondent dict rather than
+    Respondent instances
+
+    :param party_uuids: the party uuids
+    :return: rows of respondent columns or empty list
+    """
+    logger.debug('Querying respondent rows by party_uuids', party_uuids=party_uuids)
+    return session.query(Respondent.id,
+                         Respondent.party_uuid,
+                         Respondent.status,
+                         Respondent.email_address,
+                         Respondent.pending_email_address,
+                         Respondent.first_name,
+                         Respondent.last_name,
+                         Respondent.telephone,
+                         Respondent.mark_for_deletion).filter(Respondent.party_uuid.in_(party_uuids))
+
+
+def query_business_association_rows_by_respondent_ids(respondent_ids, session):
+    """
+    Query to return the businesses associated with respondents along with their enrolments, one row per enrolment (or
+    a single row with no enrolment for a business the respondent isn't enrolled on)
+
+    :param respondent_ids: a list of respondent ids (not party uuids)
+    :return: rows of respondent_id, business party_uuid, business_ref, survey_id and enrolment_status
+    """
+    logger.debug('Querying business association rows by respondent_ids', respondent_ids=respondent_ids)
+    return session.query(BusinessRespondent.respondent_id,
+                         Business.party_uuid,
+                         Business.business_ref,
+                         Enrolment.survey_id,
+                         Enrolment.status.label('enrolment_status')) \
+        .join(Business, Business.party_uuid == BusinessRespondent.business_id) \
+        .outerjoin(Enrolment, and_(Enrolment.business_id == BusinessRespondent.business_id,
+                                   Enrolment.respondent_id == BusinessRespondent.respondent_id)) \
+        .filter(BusinessRespondent.respondent_id.in_(respondent_ids))
+
+
+def query_respondent_enrolment_rows(business_id, survey_id, enrolment_statuses, session):
+    """
+    Query to return a business' respondents that are enrolled on a survey, one row per matching enrolment
+
+    :param business_id: the business party uuid
+    :param survey_id: the survey id
+    :param enrolment_statuses: a list of EnrolmentStatus to match, or None for any status
+    :return: rows of respondent party_uuid, survey_id and enrolment_status
+    """
+    logger.debug('Querying respondent enrolment rows', business_id=business_id, survey_id=survey_id)
+    query = session.query(Respondent.party_uuid,
+                          Enrolment.survey_id,
+                          Enrolment.status.label('enrolment_status')) \
+        .join(Enrolment, Enrolment.respondent_id == Respondent.id) \
+        .filter(Enrolment.business_id == business_id, Enrolment.survey_id == survey_id)
+    if enrolment_statuses is not None:
+        query = query.filter(Enrolment.status.in_(enrolment_statuses))
+    return query
+
+
+def query_business_enrolment_rows(respondent_id, survey_id, enrolment_statuses, session):
+    """
+    Query to return the businesses a respondent is enrolled on a survey for, one row per matching enrolment
+
+    :param respondent_id: the respondent id (not party uuid)
+    :param survey_id: the survey id
+    :param enrolment_statuses: a list of EnrolmentStatus to match, or None for any status
+    :return: rows of business party_uuid, survey_id and enrolment_status
+    """
+    logger.debug('Querying business enrolment rows', respondent_id=respondent_id, survey_id=survey_id)
+    query = session.query(Business.party_uuid,
+                          Enrolment.survey_id,
+                          Enrolment.status.label('enrolment_status')) \
+        .join(Enrolment, Enrolment.business_id == Business.party_uuid) \
+        .filter(Enrolment.respondent_id == respondent_id, Enrolment.survey_id == survey_id)
+    if enrolment_statuses is not None:
+        query = query.filter(Enrolment.status.in_(enrolment_statuses))
+    return query
+
+
+def query_respondent_claim(respondent_party_uuid, business_id, survey_id, session):
+    """
+    Query whether a respondent has an enabled enrolment on a survey for a business, in a single statement
+
+    :param respondent_party_uuid: the respondent's party uuid
+    :param business_id: the business party uuid
+    :param survey_id: the survey id
+    :return: a row of the respondent's status and whether they're enrolled, or None if the respondent doesn't exist
+    """
+    logger.debug('Querying respondent claim', respondent_id=respondent_party_uuid, business_id=business_id,
+                 survey_id=survey_id)
+    enrolled = exists().where(and_(Enrolment.respondent_id == Respondent.id,
+                                   Enrolment.business_id == business_id,
+                                   Enrolment.survey_id == survey_id,
+                                   Enrolment.status == EnrolmentStatus.ENABLED))
+    return session.query(Respondent.status, enrolled.label('enrolled')) \
+        .filter(Respondent.party_uuid == respondent_party_uuid).first()
+
+
 def query_respondent_by_names_and_emails(first_name, last_name, email, page, limit, session):
     """
     returns respondents which match first_name, last_name and email, ignoring case in all cases
@@ -129,7 +406,7 @@ def query_respondent_by_names_and_emails(first_name, last_name, email, page, lim
     :param session:
     """
 
-    logger.info('Querying respondents by names and/or email', email=obfuscate_email(email), page=page, limit=limit)
+    logger.debug('Querying respondents by names and/or email', email=obfuscate_email(email), page=page, limit=limit)
 
     conditions = []
 
@@ -156,7 +433,7 @@ def query_respondent_by_party_uuid(party_uuid, session):
     :param party_uuid: the party uuid
     :return: respondent or none
     """
-    logger.info('Querying respondents by party_uuid', party_uuid=party_uuid)
+    logger.debug('Querying respondents by party_uuid', party_uuid=party_uuid)
     return session.query(Respondent).filter(Respondent.party_uuid == party_uuid).first()
 
 
@@ -167,7 +444,7 @@ def query_respondent_by_email(email, session):
     :param email: the party email
     :return: respondent or none
     """
-    logger.info('Querying respondents by email')
+    logger.debug('Querying respondents by email')
     return session.query(Respondent).filter(func.lower(Respondent.email_address) == email.lower()).first()
 
 
@@ -179,7 +456,7 @@ def query_single_respondent_by_email(email, session):
     :param email: the party email
     :return: single respondent or exception thrown
     """
-    logger.info('Querying respondents by email, expecting exactly one result')
+    logger.debug('Querying respondents by email, expecting exactly one result')
     return session.query(Respondent).filter(func.lower(Respondent.email_address) == email.lower()).one()
 
 
@@ -190,7 +467,7 @@ def query_respondent_by_pending_email(email, session):
     :param email: the party uuid
     :return: respondent or none
     """
-    logger.info('Querying respondents by pending email address')
+    logger.debug('Querying respondents by pending email address')
     return session.query(Respondent).filter(func.lower(Respondent.pending_email_address) == email.lower()).first()
 
 
@@ -203,7 +480,7 @@ def query_business_respondent_by_respondent_id_and_business_id(business_id, resp
     :param session:
     :return: business associations for respondent
     """
-    logger.info('Querying business respondent', respondent_id=respondent_id, business_id=business_id)
+    logger.debug('Querying business respondent', respondent_id=respondent_id, business_id=business_id)
 
     response = session.query(BusinessRespondent).filter(and_(BusinessRespondent.business_id == business_id,
                                                              BusinessRespondent.respondent_id == respondent_id)).first()
@@ -245,14 +522,14 @@ def search_businesses(search_query, page, limit, session):
     :return: list of businesses
     """
     bound_logger = logger.bind(search_query=search_query)
-    bound_logger.info('Searching businesses by name with search query')
+    bound_logger.debug('Searching businesses by name with search query')
     if len(search_query) == 11 and search_query.isdigit():
-        bound_logger.info("Query looks like an ru_ref, searching only on ru_ref")
+        bound_logger.debug("Query looks like an ru_ref, searching only on ru_ref")
         result = session.query(BusinessAttributes.name, BusinessAttributes.trading_as, Business.business_ref) \
             .join(Business).filter(Business.business_ref == search_query).distinct().all()
         if result:
             return result, len(result)  # ru ref searches do not need to support pagination
-        bound_logger.info("Didn't find an ru_ref, searching everything")
+        bound_logger.debug("Didn't find an ru_ref, searching everything")
 
     filters = []
     name_filters = []
@@ -295,7 +572,7 @@ def query_enrolment_by_survey_business_respondent(respondent_id, business_id, su
     :return: enrolment for survey and business for respondent
     """
 
-    logger.info('Querying enrolment', respondent_id=respondent_id, business_id=business_id, survey_id=survey_id)
+    logger.debug('Querying enrolment', respondent_id=respondent_id, business_id=business_id, survey_id=survey_id)
 
     response = session.query(Enrolment).filter(and_(Enrolment.respondent_id == respondent_id,
                                                     Enrolment.business_id == business_id,
@@ -311,7 +588,7 @@ def query_all_non_disabled_enrolments_respondent(respondent_id, session):
     :return: enrolments for the respondent
     """
 
-    logger.info('Querying all enrolments for respondent', respondent_id=respondent_id)
+    logger.debug('Querying all enrolments for respondent', respondent_id=respondent_id)
 
     response = session.query(Enrolment).filter(and_(Enrolment.respondent_id == respondent_id,
                                                     Enrolment.status != 'DISABLED')).all()
@@ -326,7 +603,7 @@ def count_enrolment_by_survey_business(business_id, survey_id, session):
     :param survey_id:
     :return: Integer count of number of enrolments
     """
-    logger.info('Querying enrolment', business_id=business_id, survey_id=survey_id)
+    logger.debug('Querying enrolment', business_id=business_id, survey_id=survey_id)
     response = session.query(Enrolment).filter(and_(Enrolment.business_id == business_id,
                                                     Enrolment.survey_id == survey_id,
                                                     Enrolment.status == EnrolmentStatus.ENABLED)).count()
@@ -1,5 +1,6 @@
 import logging
 import uuid
+from collections import defaultdict
 
 import structlog
 from flask import jsonify
@@ -7,12 +8,14 @@ from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.exceptions import BadRequest, NotFound
 
 from ras_party.controllers.account_controller import change_respondent, get_single_respondent_by_email
-from ras_party.models.models import Enrolment, BusinessRespondent, PendingEnrolment, Respondent
+from ras_party.models.models import Enrolment, BusinessRespondent, PendingEnrolment, Respondent, RespondentStatus
 from ras_party.controllers.queries import query_respondent_by_party_uuid, \
     query_respondent_by_email, update_respondent_details, query_respondent_by_names_and_emails, \
-    query_respondent_by_party_uuids
+    query_respondent_rows_by_party_uuids, query_business_association_rows_by_respondent_ids, query_respondent_claim
+from ras_party.support.claims import cache_claim, cached_claim, forget_claims
 from ras_party.support.session_decorator import with_db_session, with_query_only_db_session
 from ras_party.support.util import obfuscate_email
+from ras_party.support.verification import forget_verified_tokens
 
 logger = structlog.wrap_logger(logging.getLogger(__name__))
 
@@ -27,8 +30,16 @@ def get_respondent_by_ids(ids, session):
     :type ids: str
     :rtype: Respondent
     """
-    respondents = query_respondent_by_party_uuids(ids, session)
-    return [respondent.to_respondent_dict() for respondent in respondents]
+    respondents = query_respondent_rows_by_party_uuids(ids, session).all()
+    if not respondents:
+        return []
+
+    associations = defaultdict(list)
+    for row in query_business_association_rows_by_respondent_ids([r.id for r in respondents], session):
+        associations[row.respondent_id].append(row)
+
+    return [Respondent.respondent_dict_from_rows(respondent, associations[respondent.id])
+            for respondent in respondents]
 
 
 @with_query_only_db_session
@@ -104,6 +115,8 @@ def delete_respondents_marked_for_deletion(session):
     """
     respondents = session.query(Respondent).filter(Respondent.mark_for_deletion == True)
     for respondent in respondents:
+        forget_verified_tokens(respondent.id)
+        forget_claims(respondent.party_uuid)
         session.query(Enrolment).filter(Enrolment.respondent_id == respondent.id).delete()
         session.query(BusinessRespondent).filter(BusinessRespondent.respondent_id == respondent.id).delete()
         session.query(PendingEnrolment).filter(PendingEnrolment.respondent_id == respondent.id).delete()
@@ -124,6 +137,8 @@ def delete_respondent_by_email(email, session):
     # We need to get the respondent to make sure they exist, but also because the id (not the party_uuid...for
     # some reason) of the respondent is needed for the later deletion steps.
     respondent = get_single_respondent_by_email(email, session)
+    forget_verified_tokens(respondent.id)
+    forget_claims(respondent.party_uuid)
 
     session.query(Enrolment).filter(Enrolment.respondent_id == respondent.id).delete()
     session.query(BusinessRespondent).filter(BusinessRespondent.respondent_id == respondent.id).delete()
@@ -179,18 +194,37 @@ def change_respondent_details(respondent_data, respondent_id, session):
 
 
 def does_user_have_claim(user_id, business_id, survey_id):
-    # with_db_session function wrapper automatically injects the session parameter
-    # pylint: disable=no-value-for-parameter
-    user_details = get_respondent_by_id(user_id)
-    associations = user_details['associations']
-    is_enrolled = _is_user_enrolled_on_survey(associations, business_id, survey_id)
-    return user_details['status'] == 'ACTIVE' and is_enrolled
+    """
+    Whether a respondent is active and has an enabled enrolment on a survey for a business.  Claims that are held are
+    cached for CLAIM_CACHE_TTL seconds, as this is checked on nearly every page a respondent views, until they're
+    taken away.
+
+    :raises BadRequest: if the user_id isn't a valid uuid
+    :raises NotFound: if the respondent doesn't exist
+    """
+    if cached_claim(user_id, business_id, survey_id):
+        return True
+    has_claim = _query_claim(user_id, business_id, survey_id)
+    if has_claim:
+        cache_claim(user_id, business_id, survey_id)
+    return has_claim
+
 
+@with_query_only_db_session
+def _query_claim(user_id, business_id, survey_id, session):
+    try:
+        uuid.UUID(user_id)
+    except ValueError:
+        logger.info("respondent_id value is not a valid UUID", respondent_id=user_id)
+        raise BadRequest(f"'{user_id}' is not a valid UUID format for property 'id'")
+    try:
+        uuid.UUID(business_id)
+    except ValueError:
+        return False
 
-def _is_user_enrolled_on_survey(associations, business_id, survey_id):
-    for association in associations:
-        surveys = [v['surveyId'] for v in association['enrolments'] if v['enrolmentStatus'] == 'ENABLED']
-        if survey_id in surveys and str(association['partyId']) == business_id:
-            return True
+    claim = query_respondent_claim(user_id, business_id, survey_id, session)
+    if not claim:
+        logger.info("Respondent with party id does not exist", respondent_id=user_id)
+        raise NotFound("Respondent with party id does not exist")
 
-    return False
+    return claim.status == RespondentStatus.ACTIVE and claim.enrolled
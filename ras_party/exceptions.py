@@ -1,3 +1,6 @@
+from werkzeug.exceptions import ServiceUnavailable
+
+
 class RasNotifyError(Exception):
 
     def __init__(self, description=None, error=None, **kwargs):
@@ -5,3 +8,7 @@ class RasNotifyError(Exception):
         self.error = error
         for k, v in kwargs.items():
             self.__dict__[k] = v
+
+
+class DownstreamUnavailable(ServiceUnavailable):
+    """Raised instead of calling a service whose circuit breaker is open, or that has too many requests in flight"""
@@ -4,7 +4,6 @@ import logging
 import uuid
 
 import structlog
-from jsonschema import Draft4Validator
 from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, ForeignKeyConstraint, Index, Boolean, \
     UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
@@ -14,11 +13,52 @@ from sqlalchemy.types import Enum
 from werkzeug.exceptions import NotFound
 
 from ras_party.models import GUID
+from ras_party.support.schema_validation import get_schema_validator
 from ras_party.support.util import filter_falsey_values, partition_dict
 
 Base = declarative_base()
 logger = structlog.wrap_logger(logging.getLogger(__name__))
 
+NAME_ATTRIBUTES = ('runame1', 'runame2', 'runame3')
+TRADING_AS_ATTRIBUTES = ('tradstyle1', 'tradstyle2', 'tradstyle3')
+
+
+def _enrolment_dicts(enrolments):
+    return [{"surveyId": enrolment.survey_id, "enrolmentStatus": ENROLMENT_STATUS_NAMES[enrolment.status]}
+            for enrolment in enrolments]
+
+
+def _associations_from_rows(rows, to_association):
+    """
+    Groups rows of associations joined to their enrolments (one row per enrolment, or one with no survey_id when there
+    are no enrolments) into the associations of a party
+
+    :param rows: Rows with the associated party_uuid, survey_id and enrolment_status
+    :param to_association: Builds the association dict, without enrolments, from the first row for a party
+    :return: A list of association dicts
+    """
+    associations = {}
+    for row in rows:
+        association = associations.get(row.party_uuid)
+        if association is None:
+            association = associations[row.party_uuid] = dict(to_association(row), enrolments=[])
+        if row.survey_id is not None:
+            association['enrolments'].append({
+                "surveyId": row.survey_id,
+                "enrolmentStatus": ENROLMENT_STATUS_NAMES[row.enrolment_status]
+            })
+    return list(associations.values())
+
+
+def enrolled_associations_from_rows(rows):
+    """
+    Builds associations of only a party id and its enrolments, for parties fetched with their enrolments filtered
+
+    :param rows: Rows of the associated party_uuid, survey_id and enrolment_status, one per enrolment
+    :return: A list of association dicts
+    """
+    return _associations_from_rows(rows, lambda row: {"partyId": row.party_uuid})
+
 
 class Business(Base):
     __tablename__ = 'business'
@@ -34,17 +74,18 @@ class Business(Base):
     created_on = Column(DateTime, default=datetime.datetime.utcnow)
 
     @staticmethod
-    def validate(json_packet, schema):
+    def validate(json_packet, schema, fast=False):
         """
         Validate the JSON packet against the supplied schema
 
         :param json_packet: The incoming JSON packet (typically via a POST)
         :param schema: the JSON schema to validate against
-        :return: an error iterator if the packet is invalid, otherwise False
+        :param fast: Check the packet with the compiled validator first, for bulk ingestion
+        :return: a list of errors if the packet is invalid, otherwise None
         """
-        validator = Draft4Validator(schema)
-        if not validator.is_valid(json_packet):
-            return [str(e) for e in validator.iter_errors(json_packet)]
+        errors = get_schema_validator(schema).errors(json_packet, fast=fast)
+        if errors:
+            return errors
 
     @staticmethod
     def to_party(business_data):
@@ -63,52 +104,44 @@ class Business(Base):
         return party
 
     @staticmethod
-    def from_party_dict(party):
+    def from_party_dict(party, name_and_trading_as=None):
 
         b = Business(party_uuid=party.get('id', uuid.uuid4()), business_ref=party['sampleUnitRef'])
         ba = BusinessAttributes(business_id=b.party_uuid, sample_summary_id=party['sampleSummaryId'])
-        ba.attributes = party.get('attributes')
-        Business._populate_name_and_trading_as(ba)
+        ba.set_attributes(party.get('attributes'), name_and_trading_as)
 
         b.attributes.append(ba)
         b.valid = True
         return b
 
-    def add_versioned_attributes(self, party):
+    def add_versioned_attributes(self, party, name_and_trading_as=None):
         ba = BusinessAttributes(business_id=self.party_uuid,
                                 sample_summary_id=party['sampleSummaryId'])
-        ba.attributes = party.get('attributes')
-        self._populate_name_and_trading_as(ba)
+        ba.set_attributes(party.get('attributes'), name_and_trading_as)
 
         self.attributes.append(ba)
 
     @staticmethod
-    def _populate_name_and_trading_as(ba):
-        name = '{runame1} {runame2} {runame3}'.format(**ba.attributes)
-        trading_as = '{tradstyle1} {tradstyle2} {tradstyle3}'.format(**ba.attributes)
-        ba.attributes['name'] = ' '.join(name.split())
-        ba.attributes['trading_as'] = ' '.join(trading_as.split())
-        ba.name = name
-        ba.trading_as = trading_as
+    def name_and_trading_as(attributes):
+        """
+        Derive the name and trading as of a business from the runame and tradstyle attributes of a sample unit, with
+        the whitespace normalised (e.g. blank runame2 and runame3 don't leave trailing spaces).
+
+        :param attributes: The sample unit attributes
+        :return: A tuple of name and trading as
+        """
+        attributes = attributes or {}
+        name = ' '.join(str(attributes.get(key, '')) for key in NAME_ATTRIBUTES)
+        trading_as = ' '.join(str(attributes.get(key, '')) for key in TRADING_AS_ATTRIBUTES)
+        return ' '.join(name.split()), ' '.join(trading_as.split())
 
     @staticmethod
     def _get_respondents_associations(respondents):
-        associations = []
-        for business_respondent in respondents:
-            respondent_dict = {
-                "partyId": business_respondent.respondent.party_uuid,
-                "businessRespondentStatus": business_respondent.respondent.status.name
-            }
-            enrolments = business_respondent.enrolment
-            respondent_dict['enrolments'] = []
-            for enrolment in enrolments:
-                enrolments_dict = {
-                    "surveyId": enrolment.survey_id,
-                    "enrolmentStatus": EnrolmentStatus(enrolment.status).name
-                }
-                respondent_dict['enrolments'].append(enrolments_dict)
-            associations.append(respondent_dict)
-        return associations
+        return [{
+            "partyId": business_respondent.respondent.party_uuid,
+            "businessRespondentStatus": RESPONDENT_STATUS_NAMES[business_respondent.respondent.status],
+            "enrolments": _enrolment_dicts(business_respondent.enrolment)
+        } for business_respondent in respondents]
 
     def to_business_dict(self, collection_exercise_id=None):
         """
@@ -136,8 +169,69 @@ class Business(Base):
         }
         return d
 
-    def to_party_dict(self):
+    @staticmethod
+    def summary_dict_from_rows(business, attributes, association_rows):
+        """
+        Builds the same dict as to_business_summary_dict from rows of columns rather than Business instances, so read
+        only list endpoints don't pay for hydrating every business, its attributes and its respondents.
+
+        :param business: A row of party_uuid and business_ref
+        :param attributes: A row of the active attributes' sample_summary_id, name and trading_as, or None if there are
+                           no active attributes
+        :param association_rows: Rows of the business' respondents and their enrolments
+        :return: A business summary dict
+        """
+        if attributes is None:
+            logger.error("No active attributes for business", reference=business.business_ref, status=404)
+            raise NotFound("Business with reference does not have any active attributes.")
+        return {
+            'id': business.party_uuid,
+            'sampleUnitRef': business.business_ref,
+            'sampleUnitType': Business.UNIT_TYPE,
+            'sampleSummaryId': attributes.sample_summary_id,
+            'name': attributes.name,
+            'trading_as': attributes.trading_as,
+            'associations': _associations_from_rows(association_rows, lambda row: {
+                "partyId": row.party_uuid,
+                "businessRespondentStatus": RESPONDENT_STATUS_NAMES[row.respondent_status]
+            })
+        }
+
+    @staticmethod
+    def party_dict_from_rows(business, association_rows):
+        """
+        Builds the same dict as to_party_dict from rows of columns rather than a Business instance, so the business and
+        its respondents can be resolved for many references in a fixed number of queries.
+
+        :param business: A row of party_uuid, business_ref and the active attributes' attributes_id,
+                         sample_summary_id and attributes (all None if there are no active attributes)
+        :param association_rows: Rows of the business' respondents and their enrolments
+        :return: A business party dict
+        """
+        if business.attributes_id is None:
+            logger.error("No active attributes for business", reference=business.business_ref, status=404)
+            raise NotFound("Business with reference does not have any active attributes.")
+        return {
+            'id': business.party_uuid,
+            'sampleUnitRef': business.business_ref,
+            'sampleUnitType': Business.UNIT_TYPE,
+            'sampleSummaryId': business.sample_summary_id,
+            'attributes': business.attributes,
+            'name': business.attributes.get('name'),
+            'trading_as': business.attributes.get('trading_as'),
+            'associations': _associations_from_rows(association_rows, lambda row: {
+                "partyId": row.party_uuid,
+                "businessRespondentStatus": RESPONDENT_STATUS_NAMES[row.respondent_status]
+            })
+        }
+
+    def to_party_dict(self, associations=None):
+        """
+        :param associations: The associations to include, if not those of all the business' respondents
+        """
         attributes = self._get_attributes_for_collection_exercise()
+        if associations is None:
+            associations = self._get_respondents_associations(self.respondents)
         return {
             'id': self.party_uuid,
             'sampleUnitRef': self.business_ref,
@@ -146,7 +240,7 @@ class Business(Base):
             'attributes': attributes.attributes,
             'name': attributes.attributes.get('name'),
             'trading_as': attributes.attributes.get('trading_as'),
-            'associations': self._get_respondents_associations(self.respondents)
+            'associations': associations
         }
 
     def to_post_response_dict(self):
@@ -193,6 +287,22 @@ class BusinessAttributes(Base):
     Index('attributes_collection_exercise_idx', collection_exercise)
     Index('attributes_created_on_idx', created_on)
 
+    def set_attributes(self, attributes, name_and_trading_as=None):
+        """
+        Sets the sample unit attributes along with the name and trading_as columns.  The name and trading as are also
+        written into the attributes, so the columns and the JSONB copies always agree.
+
+        :param attributes: The sample unit attributes
+        :param name_and_trading_as: The name and trading as, if already derived (e.g. for a whole chunk of a bulk load)
+        """
+        name, trading_as = name_and_trading_as or Business.name_and_trading_as(attributes)
+        if attributes is not None:
+            attributes['name'] = name
+            attributes['trading_as'] = trading_as
+        self.attributes = attributes
+        self.name = name
+        self.trading_as = trading_as
+
     def to_dict(self):
         """
         Returns a dictionary representation of all the columns in this model.  This was implemented because
@@ -242,6 +352,10 @@ class RespondentStatus(enum.IntEnum):
     SUSPENDED = 2
 
 
+# Enum names looked up by member (or the equal int), rather than calling the enum and its name property for every row
+RESPONDENT_STATUS_NAMES = {status: status.name for status in RespondentStatus}
+
+
 class PendingEnrolment(Base):
     __tablename__ = 'pending_enrolment'
 
@@ -284,23 +398,12 @@ class Respondent(Base):
 
     @staticmethod
     def _get_business_associations(businesses):
-        associations = []
-        for business_respondent in businesses:
-            business_dict = {
-                "partyId": business_respondent.business.party_uuid,
-                "sampleUnitRef": business_respondent.business.business_ref,
-                "businessRespondentStatus": business_respondent.respondent.status.name
-            }
-            enrolments = business_respondent.enrolment
-            business_dict['enrolments'] = []
-            for enrolment in enrolments:
-                enrolments_dict = {
-                    "surveyId": enrolment.survey_id,
-                    "enrolmentStatus": EnrolmentStatus(enrolment.status).name
-                }
-                business_dict['enrolments'].append(enrolments_dict)
-            associations.append(business_dict)
-        return associations
+        return [{
+            "partyId": business_respondent.business.party_uuid,
+            "sampleUnitRef": business_respondent.business.business_ref,
+            "businessRespondentStatus": RESPONDENT_STATUS_NAMES[business_respondent.respondent.status],
+            "enrolments": _enrolment_dicts(business_respondent.enrolment)
+        } for business_respondent in businesses]
 
     def to_respondent_dict(self):
         d = {
@@ -311,24 +414,58 @@ class Respondent(Base):
             'firstName': self.first_name,
             'lastName': self.last_name,
             'telephone': self.telephone,
-            'status': RespondentStatus(self.status).name,
+            'status': RESPONDENT_STATUS_NAMES[self.status],
             'markForDeletion': self.mark_for_deletion,
             'associations': self._get_business_associations(self.businesses)
         }
 
         return filter_falsey_values(d)
 
-    def to_party_dict(self):
+    @staticmethod
+    def respondent_dict_from_rows(respondent, association_rows):
+        """
+        Builds the same dict as to_respondent_dict from rows of columns rather than a Respondent instance
+
+        :param respondent: A row of the respondent's columns
+        :param association_rows: Rows of the respondent's businesses and their enrolments
+        :return: A respondent dict
+        """
+        status = RESPONDENT_STATUS_NAMES[respondent.status]
+        d = {
+            'id': respondent.party_uuid,
+            'sampleUnitType': Respondent.UNIT_TYPE,
+            'pendingEmailAddress': respondent.pending_email_address,
+            'emailAddress': respondent.email_address,
+            'firstName': respondent.first_name,
+            'lastName': respondent.last_name,
+            'telephone': respondent.telephone,
+            'status': status,
+            'markForDeletion': respondent.mark_for_deletion,
+            'associations': _associations_from_rows(association_rows, lambda row: {
+                "partyId": row.party_uuid,
+                "sampleUnitRef": row.business_ref,
+                "businessRespondentStatus": status
+            })
+        }
+
+        return filter_falsey_values(d)
+
+    def to_party_dict(self, associations=None):
+        """
+        :param associations: The associations to include, if not those of all the respondent's businesses
+        """
+        if associations is None:
+            associations = self._get_business_associations(self.businesses)
         d = {
             'id': self.party_uuid,
             'sampleUnitType': self.UNIT_TYPE,
-            'status': RespondentStatus(self.status).name,
+            'status': RESPONDENT_STATUS_NAMES[self.status],
             'attributes': filter_falsey_values({
                 'emailAddress': self.email_address,
                 'firstName': self.first_name,
                 'lastName': self.last_name,
                 'telephone': self.telephone}),
-            'associations': self._get_business_associations(self.businesses)
+            'associations': associations
         }
 
         return d
@@ -341,6 +478,9 @@ class EnrolmentStatus(enum.IntEnum):
     SUSPENDED = 3
 
 
+ENROLMENT_STATUS_NAMES = {status: status.name for status in EnrolmentStatus}
+
+
 class Enrolment(Base):
     __tablename__ = 'enrolment'
 
@@ -355,6 +495,7 @@ class Enrolment(Base):
     Index('enrolment_respondent_idx', respondent_id)
     Index('enrolment_survey_idx', survey_id)
     Index('enrolment_status_idx', status)
+    Index('enrolment_claim_idx', respondent_id, business_id, survey_id, status)
 
     __table_args__ = (
         ForeignKeyConstraint(['business_id', 'respondent_id'],
@@ -0,0 +1,92 @@
+import threading
+import time
+
+from flask import current_app
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    A small in-process cache whose entries expire a fixed number of seconds after they're set.  Each worker process has
+    its own, so it's only suitable for results that can be a little out of date; a ttl of 0 disables it.  When full,
+    expired entries are dropped and then the oldest ones.
+    """
+
+    def __init__(self, ttl, maxsize=10000, timer=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._timer = timer
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        :param key: The key of the entry
+        :param default: Returned if there's no entry for the key, or it has expired
+        """
+        if not self.ttl:
+            return default
+        with self._lock:
+            expires, value = self._entries.get(key, (None, _MISSING))
+            if value is _MISSING:
+                return default
+            if expires <= self._timer():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        :param key: The key of the entry
+        :param value: The value to cache
+        :param ttl: Expire the entry sooner than the cache's ttl, e.g. when the value is only valid for so long
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            now = self._timer()
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.maxsize:
+                self._evict(now)
+            self._entries[key] = (now + ttl, value)
+
+    def pop(self, key):
+        """Remove the entry for a key, if there is one"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def pop_matching(self, predicate):
+        """Remove every entry whose value the predicate is true for"""
+        with self._lock:
+            for key in [key for key, (_, value) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self, now):
+        for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+        while len(self._entries) >= self.maxsize:
+            del self._entries[next(iter(self._entries))]
+
+
+def app_cache(name, ttl_config_key):
+    """
+    Get one of the current app's caches, created on first use with its ttl (in seconds) from the app's config
+
+    :param name: The name of the cache
+    :param ttl_config_key: The config setting of the cache's ttl
+    :rtype: TTLCache
+    """
+    caches = current_app.extensions.setdefault('party_caches', {})
+    cache = caches.get(name)
+    if cache is None:
+        cache = caches[name] = TTLCache(current_app.config[ttl_config_key])
+    return cache
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import structlog
+from flask import current_app
+
+from ras_party.exceptions import DownstreamUnavailable
+
+logger = structlog.wrap_logger(logging.getLogger(__name__))
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+
+class CircuitBreaker:
+    """
+    Guards the calls to one service.  At most max_concurrent calls are made at once (a bulkhead, so a slow service can
+    only hold up that many of a worker's requests), and after failure_threshold calls in a row fail (a connection
+    error, a timeout or a 5xx response) the circuit opens and calls fail straight away for reset_timeout seconds.
+    Then a single call is let through to try the service again, which closes the circuit if it succeeds.
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout, max_concurrent, timer=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._timer = timer
+        self._bulkhead = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = None
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls func, unless the circuit is open or the service already has max_concurrent calls in flight
+
+        :raises DownstreamUnavailable: Raised instead of calling func
+        """
+        if not self._bulkhead.acquire(blocking=False):
+            self._reject('Too many requests in flight')
+        try:
+            self._before_call()
+            try:
+                response = func(*args, **kwargs)
+            except Exception:
+                self._record(failed=True)
+                raise
+            self._record(failed=response.status_code >= 500)
+            return response
+        finally:
+            self._bulkhead.release()
+
+    def _before_call(self):
+        with self._lock:
+            allowed = self.state == CLOSED
+            if self.state == OPEN and self._timer() - self.opened_at >= self.reset_timeout:
+                # Let this call through to try the service again; others are rejected until it has finished
+                logger.info('Trying service again', service=self.name)
+                self.state = HALF_OPEN
+                allowed = True
+            if allowed:
+                self.in_flight += 1
+                self.calls += 1
+                return
+        self._reject('Circuit open')
+
+    def _reject(self, reason):
+        with self._lock:
+            self.rejected += 1
+        logger.warning('Not calling service', service=self.name, reason=reason)
+        raise DownstreamUnavailable(f'{self.name} is unavailable')
+
+    def _record(self, failed):
+        with self._lock:
+            self.in_flight -= 1
+            if not failed:
+                if self.state != CLOSED:
+                    logger.info('Service has recovered', service=self.name)
+                self.state = CLOSED
+                self.consecutive_failures = 0
+                return
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.error('Service is failing, opening circuit', service=self.name,
+                                 consecutive_failures=self.consecutive_failures)
+                self.state = OPEN
+                self.opened_at = self._timer()
+
+    def stats(self):
+        """
+        The state of the circuit and the calls made through it since it was created
+
+        :rtype: dict
+        """
+        return {
+            'state': self.state,
+            'inFlight': self.in_flight,
+            'calls': self.calls,
+            'failures': self.failures,
+            'consecutiveFailures': self.consecutive_failures,
+            'rejected': self.rejected,
+        }
+
+
+def circuit_breakers():
+    """
+    The current app's circuit breakers, by the host (and port) of the service each guards
+
+    :rtype: dict
+    """
+    return current_app.extensions.setdefault('circuit_breakers', {})
+
+
+def circuit_breaker_for(url):
+    """
+    Gets the circuit breaker of the service a url is for, created on first use from the CIRCUIT_BREAKER_* and
+    DOWNSTREAM_MAX_CONCURRENT_REQUESTS config
+
+    :param url: The url being requested
+    :rtype: CircuitBreaker
+    """
+    name = urlsplit(url).netloc
+    breakers = circuit_breakers()
+    breaker = breakers.get(name)
+    if breaker is None:
+        config = current_app.config
+        breaker = breakers.setdefault(name, CircuitBreaker(name,
+                                                           config['CIRCUIT_BREAKER_FAILURE_THRESHOLD'],
+                                                           config['CIRCUIT_BREAKER_RESET_TIMEOUT'],
+                                                           config['DOWNSTREAM_MAX_CONCURRENT_REQUESTS']))
+    return breaker
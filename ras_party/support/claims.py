@@ -0,0 +1,48 @@
+import uuid
+
+from ras_party.support.cache import app_cache
+
+
+def claim_cache():
+    """
+    The cache of respondents' claims on a business' survey, keyed by the respondent, business and survey ids as they
+    were asked about, with the ids normalised as the value so the claims can be found again when they're taken away.
+    Only claims that are held are cached, so a new enrolment is seen straight away.
+
+    :rtype: TTLCache
+    """
+    return app_cache('claims', 'CLAIM_CACHE_TTL')
+
+
+def cached_claim(respondent_id, business_id, survey_id):
+    """Whether a respondent is known to have a claim on a business' survey, or None if it has to be checked"""
+    return True if claim_cache().get((respondent_id, business_id, survey_id)) else None
+
+
+def cache_claim(respondent_id, business_id, survey_id):
+    """
+    Caches a claim a respondent has been found to have
+
+    :param respondent_id: The respondent's party uuid, which must be a valid uuid
+    :param business_id: The business' party uuid, which must be a valid uuid
+    :param survey_id: The survey's id
+    """
+    claim = (str(uuid.UUID(str(respondent_id))), str(uuid.UUID(str(business_id))), survey_id)
+    claim_cache().set((respondent_id, business_id, survey_id), claim)
+
+
+def forget_claims(respondent_id, business_id=None, survey_id=None):
+    """
+    Removes a respondent's claims from the cache, or only the claim on one business' survey, when an enrolment or the
+    respondent's status changes or the respondent is deleted
+
+    :param respondent_id: The respondent's party uuid
+    :param business_id: The business' party uuid, if only the claim on one business' survey is to be removed
+    :param survey_id: The survey's id, if only the claim on one business' survey is to be removed
+    """
+    respondent_id = str(respondent_id).lower()
+    if business_id is None:
+        claim_cache().pop_matching(lambda claim: claim[0] == respondent_id)
+    else:
+        business_id = str(business_id).lower()
+        claim_cache().pop_matching(lambda claim: claim == (respondent_id, business_id, survey_id))
@@ -0,0 +1,35 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit(func, *args, **kwargs):
+    """
+    Runs a function in the background, in an app context of its own, so that independent calls to other services (and
+    database queries made meanwhile by the caller) overlap rather than running one after another.  Under the gevent
+    workers the executor's threads are greenlets.
+
+    :param func: The function to call, e.g. one that requests something from another service
+    :return: A concurrent.futures.Future of the function's result, whose result() re-raises anything the function
+             raised
+    """
+    app = current_app._get_current_object()
+
+    def call():
+        with app.app_context():
+            return func(*args, **kwargs)
+
+    return _get_executor(app.config['DOWNSTREAM_REQUEST_THREADS']).submit(call)
+
+
+def _get_executor(max_workers):
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='downstream')
+    return _executor
@@ -0,0 +1,70 @@
+import logging
+import threading
+import time
+
+import structlog
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+from ras_party.support.metrics import DB_POOL_CHECKED_OUT, DB_POOL_CHECKOUT_WAIT
+
+logger = structlog.wrap_logger(logging.getLogger(__name__))
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    A QueuePool that records how long checkouts wait for a connection (including opening one, when the pool is below
+    its size) and how many give up after the pool timeout, so the pool and the number of replicas can be sized from
+    what the service actually sees.  They're also exported as metrics, labelled with the pool's logging name.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait = 0.0
+        self.max_checkout_wait = 0.0
+        self._pool_label = self._orig_logging_name or 'primary'
+
+    def _do_get(self):
+        start = time.monotonic()
+        try:
+            connection = super()._do_get()
+            DB_POOL_CHECKED_OUT.labels(self._pool_label).inc()
+            return connection
+        except TimeoutError:
+            with self._stats_lock:
+                self.checkout_timeouts += 1
+            logger.warning('Timed out waiting for a database connection', **self.stats())
+            raise
+        finally:
+            self._record_checkout(time.monotonic() - start)
+
+    def _record_checkout(self, wait):
+        with self._stats_lock:
+            self.checkouts += 1
+            self.checkout_wait += wait
+            self.max_checkout_wait = max(self.max_checkout_wait, wait)
+        DB_POOL_CHECKOUT_WAIT.labels(self._pool_label).observe(wait)
+
+    def _do_return_conn(self, conn):
+        DB_POOL_CHECKED_OUT.labels(self._pool_label).dec()
+        super()._do_return_conn(conn)
+
+    def stats(self):
+        """
+        The current state of the pool and the checkout waits since it was created
+
+        :rtype: dict
+        """
+        return {
+            'size': self.size(),
+            'checkedIn': self.checkedin(),
+            'checkedOut': self.checkedout(),
+            'overflow': self.overflow(),
+            'checkouts': self.checkouts,
+            'checkoutTimeouts': self.checkout_timeouts,
+            'checkoutWaitSeconds': round(self.checkout_wait, 6),
+            'maxCheckoutWaitSeconds': round(self.max_checkout_wait, 6),
+        }
@@ -0,0 +1,147 @@
+import logging
+import os
+import time
+
+import structlog
+from flask import current_app, g, has_app_context, request
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+logger = structlog.wrap_logger(logging.getLogger(__name__))
+
+# Under gunicorn each worker writes its metrics to files in this directory, and /metrics adds them up across workers
+MULTIPROCESS_DIR_ENV = 'prometheus_multiproc_dir'
+
+HTTP_REQUEST_DURATION = Histogram('party_http_request_duration_seconds',
+                                  'Time taken to handle a request, by route',
+                                  ['method', 'endpoint', 'status'])
+DB_QUERIES = Counter('party_db_queries_total',
+                     'Database statements executed, by the decorated function whose session executed them',
+                     ['function'])
+DB_QUERY_DURATION = Histogram('party_db_query_duration_seconds',
+                              'Time taken to execute a database statement, by the decorated function whose session '
+                              'executed it',
+                              ['function'])
+DB_POOL_CHECKED_OUT = Gauge('party_db_pool_checked_out_connections',
+                            'Database connections checked out of the pool',
+                            ['pool'], multiprocess_mode='livesum')
+DB_POOL_CHECKOUT_WAIT = Histogram('party_db_pool_checkout_wait_seconds',
+                                  'Time spent waiting for a database connection from the pool',
+                                  ['pool'])
+DOWNSTREAM_REQUEST_DURATION = Histogram('party_downstream_request_duration_seconds',
+                                        'Time taken by requests to other services, by service',
+                                        ['service', 'method', 'outcome'])
+NOTIFY_PUBLISH_DURATION = Histogram('party_notify_publish_duration_seconds',
+                                    'Time taken to publish a notify message to pubsub',
+                                    ['outcome'])
+
+
+class QueryStats:
+    """The database statements executed in an app context: how many, the time they took and the slowest of them"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self.slowest_function = None
+
+    def record(self, statement, duration, function):
+        self.count += 1
+        self.seconds += duration
+        if duration >= self.slowest_seconds:
+            self.slowest_seconds = duration
+            self.slowest_statement = statement
+            self.slowest_function = function
+
+
+def start_request_timer():
+    """Registered as a before_request hook"""
+    g.request_started_at = time.perf_counter()
+
+
+def record_request(response):
+    """
+    Registered as an after_request hook.  Requests that don't match a route are counted together, under 'none'.
+
+    The request's database statements are logged, as a warning if there were more than DATABASE_QUERY_COUNT_WARNING
+    of them or the slowest took longer than DATABASE_SLOW_QUERY_SECONDS, and with DATABASE_QUERY_HEADERS set they're
+    summarised in the X-Database-Query-* response headers too.
+    """
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'none'
+    started_at = g.get('request_started_at')
+    if started_at is not None:
+        HTTP_REQUEST_DURATION.labels(request.method, endpoint, response.status_code)\
+            .observe(time.perf_counter() - started_at)
+
+    stats = g.get('db_query_stats')
+    if stats is None:
+        return response
+    config = current_app.config
+    log = logger.warning if (stats.count > config['DATABASE_QUERY_COUNT_WARNING']
+                             or stats.slowest_seconds > config['DATABASE_SLOW_QUERY_SECONDS']) else logger.debug
+    log('Database queries made by request', method=request.method, path=request.path, endpoint=endpoint,
+        status=response.status_code, query_count=stats.count, query_seconds=round(stats.seconds, 6),
+        slowest_query_seconds=round(stats.slowest_seconds, 6), slowest_query=stats.slowest_statement,
+        slowest_query_function=stats.slowest_function)
+    if config['DATABASE_QUERY_HEADERS']:
+        response.headers['X-Database-Query-Count'] = str(stats.count)
+        response.headers['X-Database-Query-Seconds'] = f'{stats.seconds:.6f}'
+        response.headers['X-Database-Slowest-Query-Seconds'] = f'{stats.slowest_seconds:.6f}'
+    return response
+
+
+def current_db_function():
+    """The name of the outermost decorated function using a database session in the current app context"""
+    if has_app_context():
+        return g.get('db_function', 'none')
+    return 'none'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', {})[id(cursor)] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_started_at'].pop(id(cursor))
+    function = current_db_function()
+    DB_QUERIES.labels(function).inc()
+    DB_QUERY_DURATION.labels(function).observe(duration)
+    if has_app_context():
+        if 'db_query_stats' not in g:
+            g.db_query_stats = QueryStats()
+        g.db_query_stats.record(statement, duration, function)
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute doesn't run for a statement that fails, so its start time is dropped here instead of being
+    # left on the pooled connection
+    conn, cursor = exception_context.connection, exception_context.cursor
+    if conn is not None and cursor is not None:
+        conn.info.get('query_started_at', {}).pop(id(cursor), None)
+
+
+def instrument_engine(engine):
+    """
+    Counts and times the statements executed by an engine's connections, for the metrics and for each request
+
+    :param engine: A sqlalchemy Engine
+    """
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+
+def latest_metrics():
+    """
+    The current metrics, in the Prometheus text format.  When running under gunicorn these are the sum of all the
+    workers' metrics rather than just this worker's.
+
+    :rtype: bytes
+    """
+    if os.getenv(MULTIPROCESS_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,108 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import time
+
+import structlog
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+logger = structlog.wrap_logger(logging.getLogger(__name__))
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_FILE_HEADER = 'X-Profile-File'
+_SALT = 'request-profiling'
+_OUTPUTS = ('file', 'response')
+
+
+def profiling_token(secret_key, output='file'):
+    """
+    A token for the X-Profile header, which gets a request profiled by a service with PROFILING_ENABLED set
+
+    :param secret_key: The service's SECRET_KEY
+    :param output: 'file' to write the profile to PROFILING_DIR, or 'response' to return it instead of the response
+    :rtype: str
+    """
+    if output not in _OUTPUTS:
+        raise ValueError(f'output must be one of {_OUTPUTS}')
+    return URLSafeTimedSerializer(secret_key, salt=_SALT).dumps(output)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests with cProfile: a random PROFILING_SAMPLE_RATE fraction of them, whose profiles are written to
+    PROFILING_DIR, and requests with an X-Profile header holding a profiling_token (signed with SECRET_KEY and no older
+    than PROFILING_TOKEN_MAX_AGE seconds).  A profile written to a file is named in the X-Profile-File response header,
+    and can be read with pstats or snakeviz.
+
+    Under the gevent workers the profile also includes whatever the worker's other greenlets did meanwhile.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+
+    def __call__(self, environ, start_response):
+        output = self._profile_output(environ)
+        if output is None:
+            return self.wsgi_app(environ, start_response)
+
+        captured = {}
+        body = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured['status'], captured['headers'] = status, headers
+            return body.append
+
+        def run_app():
+            app_iter = self.wsgi_app(environ, capture_start_response)
+            try:
+                body.extend(app_iter)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.runcall(run_app)
+        elapsed = time.perf_counter() - start
+
+        status, headers = captured['status'], captured['headers']
+        if output == 'response':
+            report = io.StringIO()
+            pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(50)
+            body = [f'{environ["REQUEST_METHOD"]} {environ.get("PATH_INFO")} {status} in {elapsed:.3f}s\n\n'
+                    f'{report.getvalue()}'.encode()]
+            headers = [('Content-Type', 'text/plain; charset=utf-8'), ('Content-Length', str(len(body[0])))]
+            status = '200 OK'
+        else:
+            filename = self._dump(profile, environ, elapsed)
+            headers = headers + [(PROFILE_FILE_HEADER, filename)]
+        start_response(status, headers)
+        return body
+
+    def _profile_output(self, environ):
+        config = self.app.config
+        token = environ.get('HTTP_' + PROFILE_HEADER.upper().replace('-', '_'))
+        if token:
+            serializer = URLSafeTimedSerializer(config['SECRET_KEY'], salt=_SALT)
+            try:
+                return serializer.loads(token, max_age=config['PROFILING_TOKEN_MAX_AGE'])
+            except BadSignature:
+                logger.warning('Not profiling request, invalid profiling token', path=environ.get('PATH_INFO'))
+        if random.random() < config['PROFILING_SAMPLE_RATE']:
+            return 'file'
+        return None
+
+    def _dump(self, profile, environ, elapsed):
+        directory = self.app.config['PROFILING_DIR']
+        os.makedirs(directory, exist_ok=True)
+        path = re.sub(r'[^\w-]+', '.', environ.get('PATH_INFO', '')).strip('.') or 'root'
+        filename = f'{environ["REQUEST_METHOD"]}.{path}.{elapsed * 1000:.0f}ms.{time.time():.6f}.prof'
+        profile.dump_stats(os.path.join(directory, filename))
+        logger.info('Profiled request', path=environ.get('PATH_INFO'), seconds=round(elapsed, 6),
+                    profile=filename)
+        return filename
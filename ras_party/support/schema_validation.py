@@ -0,0 +1,52 @@
+import fastjsonschema
+from jsonschema import Draft4Validator
+
+DRAFT_4_SCHEMA_URI = 'http://json-schema.org/draft-04/schema#'
+
+_validators = {}
+
+
+class SchemaValidator:
+    """
+    Holds the compiled validators for a JSON schema, so the schema is only compiled once rather than on every
+    validation.  The jsonschema validator reports every error in a document, the fastjsonschema one stops at the first
+    error but is considerably quicker, so it's used to check documents that are expected to be valid (e.g. bulk
+    ingestion), falling back to the jsonschema validator only to describe the errors of an invalid document.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._validator = Draft4Validator(schema)
+        self._fast_validator = fastjsonschema.compile({'$schema': DRAFT_4_SCHEMA_URI, **schema})
+
+    def errors(self, json_packet, fast=False):
+        """
+        Validate a JSON packet in a single pass
+
+        :param json_packet: The JSON packet to validate
+        :param fast: Use the compiled validator to check the packet before describing any errors
+        :return: A list of error messages, empty if the packet is valid
+        :rtype: list of str
+        """
+        if fast:
+            try:
+                self._fast_validator(json_packet)
+                return []
+            except fastjsonschema.JsonSchemaException:
+                pass
+        return [str(e) for e in self._validator.iter_errors(json_packet)]
+
+
+def get_schema_validator(schema):
+    """
+    Get the compiled validator for a schema, compiling it on first use.  Validators are cached against the schema
+    object itself, so a schema replaced in the config gets a new validator.
+
+    :param schema: A JSON schema as a dict
+    :rtype: SchemaValidator
+    """
+    validator = _validators.get(id(schema))
+    if validator is None or validator.schema is not schema:
+        validator = SchemaValidator(schema)
+        _validators[id(schema)] = validator
+    return validator
@@ -1,33 +1,162 @@
 import logging
+import threading
 from functools import wraps
 
 import structlog
-from flask import current_app
+from flask import current_app, g, has_app_context
 from sqlalchemy.exc import SQLAlchemyError
 
 logger = structlog.wrap_logger(logging.getLogger(__name__))
 
 
-def handle_session(f, args, kwargs):
-    session = current_app.db.session()
+def session_scope():
+    """
+    The scope of the scoped sessions: the current app context, which Flask pushes for every request, or the current
+    thread (or greenlet, under gevent) outside of one.  Sessions are removed when their app context is torn down, so a
+    new context never picks up an old one's session even if the id of its g is reused.
+    """
+    if has_app_context():
+        return 'app', id(g._get_current_object())
+    return 'thread', threading.get_ident()
+
+
+def remove_sessions(exception=None):
+    """
+    Remove the current scope's sessions, returning their connections to the pool.  Registered as an app context
+    teardown, as a backstop to the decorators removing their own sessions.
+    """
+    db = getattr(current_app, 'db', None)
+    for scoped_session in (getattr(db, 'session', None), getattr(db, 'replica_session', None)):
+        if scoped_session is not None:
+            scoped_session.remove()
+
+
+def read_from_primary():
+    """
+    Send the query only sessions of the rest of the current request to the primary database rather than the read
+    replica, for reads that must see writes made just before them.  This happens automatically once a session in the
+    request commits.
+    """
+    g.read_from_primary = True
+
+
+def apply_statement_timeout(session, transaction, connection):  # pylint: disable=unused-argument
+    """
+    A session after_begin listener (for postgres) that sets the statement_timeout of each transaction the session
+    begins to the one chosen by the outermost decorated function using it, so bulk writes can be given longer than
+    everything else.  It's set with SET LOCAL, so it lasts only as long as the transaction and doesn't stay on the
+    pooled connection.
+    """
+    timeout = session.info.get('statement_timeout')
+    if timeout is not None:
+        connection.execute(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+
+def _statement_timeout(bulk=False):
+    """
+    The statement_timeout for a session, in milliseconds: DATABASE_BULK_STATEMENT_TIMEOUT for bulk writes (which is
+    set even when 0, to lift any default timeout of the database's), otherwise DATABASE_STATEMENT_TIMEOUT if it's set
+    """
+    if bulk:
+        return current_app.config['DATABASE_BULK_STATEMENT_TIMEOUT']
+    return current_app.config['DATABASE_STATEMENT_TIMEOUT'] or None
+
+
+def _query_only_session():
+    """
+    The scoped session for a read.  This is the read replica's if there is one, unless the request has already committed
+    something or the read is nested inside a session on the primary (which it should see the changes of).
+    """
+    replica_session = getattr(current_app.db, 'replica_session', None)
+    if replica_session is None or g.get('read_from_primary') or current_app.db.session.registry.has():
+        return current_app.db.session
+    return replica_session
+
+
+def _join_session(scoped_session, f, writes=False, statement_timeout=None):
+    """
+    Get the current scope's session, counting how many decorated functions are using it so only the outermost one
+    removes it.  The outermost decorated function is recorded as the one the queries of the app context are made for,
+    in the database metrics.
+
+    The writes are counted separately, as a write only joins the transaction of another write further up the stack.
+    Under only reads, it commits the session itself, as a read never commits what's been written.
+
+    :param writes: Whether the decorated function writes to the database
+    :param statement_timeout: The statement_timeout of the session's transactions, if it's the outermost function
+    :return: The session, whether a decorated function further up the stack is already using it, and whether a write
+             further up the stack owns its transaction
+    """
+    key = id(scoped_session)
+    depths = g.setdefault('session_depths', {})
+    write_depths = g.setdefault('session_write_depths', {})
+    depth = depths.get(key, 0)
+    write_depth = write_depths.get(key, 0)
+    depths[key] = depth + 1
+    if writes:
+        write_depths[key] = write_depth + 1
+    g.setdefault('db_function', f'{f.__module__}.{f.__qualname__}')
+    session = scoped_session()
+    if not depth:
+        session.info.update(statement_timeout=statement_timeout)
+    return session, depth > 0, write_depth > 0
+
+
+def _leave_session(scoped_session, nested, writes=False):
+    g.session_depths[id(scoped_session)] -= 1
+    if writes:
+        g.session_write_depths[id(scoped_session)] -= 1
+    if not nested:
+        scoped_session.remove()
+    if not any(g.session_depths.values()):
+        g.pop('db_function', None)
+
+
+def _begin(session, nested):
+    """A nested write runs in a savepoint of the outer session, rather than committing or removing it"""
+    return session.begin_nested() if nested else session
+
+
+def _commit(transaction, nested):
+    if not nested or transaction.is_active:
+        transaction.commit()
+    elif transaction.session is not None:
+        # The savepoint failed to flush but the function carried on regardless, so discard it
+        transaction.rollback()
+
+
+def _rollback(transaction, nested):
+    # A nested function can release or roll back its own savepoint, e.g. after a failed call to another service
+    if not nested or transaction.session is not None:
+        transaction.rollback()
+
+
+def handle_session(f, args, kwargs, bulk=False):
+    scoped_session = current_app.db.session
+    session, nested, in_transaction = _join_session(scoped_session, f, writes=True,
+                                                    statement_timeout=_statement_timeout(bulk))
+    transaction = _begin(session, in_transaction)
     try:
         result = f(*args, session=session, **kwargs)
-        session.commit()
+        _commit(transaction, in_transaction)
+        if not in_transaction:
+            read_from_primary()
         return result
     except SQLAlchemyError as exc:
         logger.error(f"Rolling back database session due to {exc.__class__.__name__}", exc_info=True)
-        session.rollback()
+        _rollback(transaction, in_transaction)
         raise SQLAlchemyError(f"{exc.__class__.__name__} occurred when committing to database", code=exc.code)
     except Exception:
         logger.error("Rolling back database session due to uncaught exception", exc_info=True)
-        session.rollback()
+        _rollback(transaction, in_transaction)
         raise
     finally:
-        current_app.db.session.remove()
+        _leave_session(scoped_session, nested, writes=True)
 
 
 def handle_query_only_session(f, args, kwargs):
-    session = current_app.db.session()
+    scoped_session = _query_only_session()
+    session, nested, _ = _join_session(scoped_session, f, statement_timeout=_statement_timeout())
     try:
         result = f(*args, session=session, **kwargs)
         return result
@@ -35,21 +164,26 @@ def handle_query_only_session(f, args, kwargs):
         logger.error("Something went wrong accessing database", exc_info=True)
         raise
     finally:
-        current_app.db.session.remove()
+        _leave_session(scoped_session, nested)
 
 
 def handle_quiet_session(f, args, kwargs):
-    session = current_app.db.session()
+    scoped_session = current_app.db.session
+    session, nested, in_transaction = _join_session(scoped_session, f, writes=True,
+                                                    statement_timeout=_statement_timeout())
+    transaction = _begin(session, in_transaction)
     try:
         result = f(*args, session=session, **kwargs)
-        session.commit()
+        _commit(transaction, in_transaction)
+        if not in_transaction:
+            read_from_primary()
         return result
     except SQLAlchemyError:
         logger.error("Something went wrong accessing database", exc_info=True)
-        session.rollback()
+        _rollback(transaction, in_transaction)
         raise
     finally:
-        current_app.db.session.remove()
+        _leave_session(scoped_session, nested, writes=True)
 
 
 def with_db_session(f):
@@ -57,6 +191,11 @@ def with_db_session(f):
     Wraps the supplied function, and introduces a correctly-scoped database session which is passed into the decorated
     function as the named parameter 'session'.
 
+    If the function is called from another decorated function that writes, it joins that function's session in a
+    savepoint, which is released or rolled back when it returns, and the outer function commits and removes the session
+    as usual.  Called from only @with_query_only_db_session functions, it commits the session itself (leaving the
+    outermost function to remove it).
+
     :param f: The function to be wrapped.
     """
 
@@ -67,6 +206,23 @@ def with_db_session(f):
     return wrapper
 
 
+def with_bulk_db_session(f):
+    """
+    Wraps the supplied function like @with_db_session, for bulk writes (e.g. a chunk of a sample) whose statements can
+    take longer than DATABASE_STATEMENT_TIMEOUT, so its session's statements are limited by
+    DATABASE_BULK_STATEMENT_TIMEOUT instead.  Called from another decorated function, it runs under that function's
+    timeout.
+
+    :param f: The function to be wrapped.
+    """
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        return handle_session(f, args, kwargs, bulk=True)
+
+    return wrapper
+
+
 def with_quiet_db_session(f):
     """
     Wraps the supplied function, and introduces a correctly-scoped database session which is passed into the decorated
@@ -94,6 +250,10 @@ def with_query_only_db_session(f):
 
     It also only handles SQLAlchemyError as the calling function is expected to handle its own non-db related errors.
 
+    If a read replica is configured (DATABASE_REPLICA_URI) the session is from the replica, unless a session has already
+    committed in the current request or read_from_primary has been called.  Called from another decorated function, it
+    uses that function's session (without removing it) if it has one.
+
     This should be removed once a better solution is found.  This function is only being added as a short term fix to
     reduce the number of logger.exception lines that aren't actually problems happening in the system.
 
@@ -1,46 +1,105 @@
+import calendar
+import hashlib
 import logging
+import time
 
 import structlog
 from flask import current_app
-from itsdangerous import URLSafeTimedSerializer
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
 from werkzeug.exceptions import InternalServerError
 
+from ras_party.support.cache import app_cache
+
 
 logger = structlog.wrap_logger(logging.getLogger(__name__))
 
 
+def _email_token_serializers():
+    """
+    Gets the app's email token serializers, which are built on first use.  The first signs new tokens with SECRET_KEY,
+    and the rest check tokens signed with the keys in SECRET_KEY_FALLBACKS, so tokens that were sent out before
+    SECRET_KEY was rotated keep working until they expire.
+
+    :return: A list of URLSafeTimedSerializer, the current key's first
+    """
+    serializers = current_app.extensions.get('email_token_serializers')
+    if serializers is None:
+        secret_key = current_app.config["SECRET_KEY"]
+        email_token_salt = current_app.config["EMAIL_TOKEN_SALT"]
+
+        # TODO: eventually implement a service startup check for all required config values
+        if secret_key is None or email_token_salt is None:
+            msg = "SECRET_KEY or EMAIL_TOKEN_SALT are not configured."
+            logger.error(msg)
+            raise InternalServerError(msg)
+
+        keys = [secret_key] + current_app.config.get("SECRET_KEY_FALLBACKS", [])
+        serializers = [URLSafeTimedSerializer(key, salt=email_token_salt) for key in keys]
+        current_app.extensions['email_token_serializers'] = serializers
+    return serializers
+
+
 def generate_email_token(email):
     """Creates a token based on a provided email address
 
     :param email: email address of the respondent
     :return: A serialised string containing the email address
     """
-    secret_key = current_app.config["SECRET_KEY"]
-    email_token_salt = current_app.config["EMAIL_TOKEN_SALT"]
-
-    # TODO: eventually implement a service startup check for all required config values
-    if secret_key is None or email_token_salt is None:
-        msg = "SECRET_KEY or EMAIL_TOKEN_SALT are not configured."
-        logger.error(msg)
-        raise InternalServerError(msg)
+    return _email_token_serializers()[0].dumps(email)
 
-    timed_serializer = URLSafeTimedSerializer(secret_key)
-    return timed_serializer.dumps(email, salt=email_token_salt)
 
-
-def decode_email_token(token, duration=None):
+def decode_email_token(token, duration=None, return_timestamp=False):
     """Decodes a token and returns the result
 
     :param token: A serialised string
     :param duration: The amount of time in seconds the token is valid for.  If the token is older
     then this number, an exception will be thrown. Default is None.
-    :return: The contents of the deserialised token
+    :param return_timestamp: Also return the datetime the token was signed at
+    :return: The contents of the deserialised token, or a tuple of them and the timestamp
     """
     logger.info('Decoding email verification token', token=token)
 
-    timed_serializer = URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
-    email_token_salt = current_app.config["EMAIL_TOKEN_SALT"]
+    serializers = _email_token_serializers()
+    for serializer in serializers:
+        try:
+            result = serializer.loads(token, max_age=duration, return_timestamp=return_timestamp)
+        except SignatureExpired:
+            raise
+        except BadSignature:
+            if serializer is serializers[-1]:
+                raise
+            continue
+        logger.info('Successfully decoded email verification token', token=token)
+        return result
+
+
+def verified_token_cache():
+    """
+    The cache of email tokens that have been verified, keyed by token_digest, with the decoded email address and the
+    respondent's id.  Frontstage checks the same token on each page load, so a hit skips decoding it and looking up
+    the respondent.
+
+    :rtype: TTLCache
+    """
+    return app_cache('verified_tokens', 'VERIFIED_TOKEN_CACHE_TTL')
+
+
+def token_digest(token):
+    """The key of a token in the verified token cache, so the cache doesn't hold usable tokens"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def cache_verified_token(token, email_address, respondent_id, signed_at, duration):
+    """
+    Caches a verified token, for no longer than the token has left before it expires
+
+    :param signed_at: The datetime the token was signed at, from decode_email_token
+    :param duration: The amount of time in seconds the token is valid for
+    """
+    expires_in = calendar.timegm(signed_at.utctimetuple()) + duration - time.time()
+    verified_token_cache().set(token_digest(token), (email_address, respondent_id), ttl=expires_in)
+
 
-    result = timed_serializer.loads(token, salt=email_token_salt, max_age=duration)
-    logger.info('Successfully decoded email verification token', token=token)
-    return result
+def forget_verified_tokens(respondent_id):
+    """Removes a respondent's tokens from the cache, when their email address changes or is verified"""
+    verified_token_cache().pop_matching(lambda entry: entry[1] == respondent_id)
@@ -34,6 +34,12 @@ def post_business():
     return jsonify(response)
 
 
+@business_view.route('/businesses/stream', methods=['POST'])
+def post_businesses_stream():
+    response = business_controller.businesses_post_stream(request.stream)
+    return jsonify(response)
+
+
 @business_view.route('/businesses', methods=['GET'])
 def get_businesses():
     ids = request.args.getlist("id")
@@ -48,6 +54,14 @@ def get_businesses():
     return jsonify(response)
 
 
+@business_view.route('/businesses/refs', methods=['POST'])
+def post_businesses_by_refs():
+    # with_db_session function wrapper automatically injects the session parameter
+    # pylint: disable=no-value-for-parameter
+    response = business_controller.get_businesses_by_refs(request.get_json())
+    return jsonify(response)
+
+
 @business_view.route('/businesses/id/<business_id>', methods=['GET'])
 def get_business_by_id(business_id):
     verbose = request.args.get('verbose', '')
@@ -83,6 +97,13 @@ def put_business_attributes_ce(sample):
     return jsonify(response)
 
 
+@business_view.route('/businesses/sample/link/<sample>', methods=['GET'])
+def get_business_attributes_ce_link_progress(sample):
+    response = business_controller.get_sample_link_progress(
+        sample, collection_exercise_id=request.args.get('collectionExerciseId'))
+    return jsonify(response)
+
+
 @business_view.route('/businesses/search', methods=['GET'])
 def get_party_by_search():
     query = request.args.get('query', '')
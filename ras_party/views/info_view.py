@@ -1,6 +1,8 @@
 from flask import Blueprint, make_response, jsonify
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from ras_party.controllers import info_controller
+from ras_party.support.metrics import latest_metrics
 
 
 info_view = Blueprint('info_view', __name__)
@@ -10,3 +12,8 @@ info_view = Blueprint('info_view', __name__)
 def get_info():
     response = info_controller.get_info()
     return make_response(jsonify(response), 200)
+
+
+@info_view.route('/metrics', methods=['GET'])
+def get_metrics():
+    return make_response(latest_metrics(), 200, {'Content-Type': CONTENT_TYPE_LATEST})
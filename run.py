@@ -3,15 +3,16 @@ import os
 from json import loads
 
 import structlog
-from flask import Flask, _app_ctx_stack
+from flask import Flask
 from flask_cors import CORS
 from retrying import retry, RetryError
-from sqlalchemy import create_engine, column, text
+from sqlalchemy import create_engine, column, event, text
 from sqlalchemy.exc import DatabaseError, ProgrammingError
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.sql import exists, select
 
 from logger_config import logger_initial_config
+from ras_party.support.schema_validation import get_schema_validator
 
 logger = structlog.wrap_logger(logging.getLogger(__name__))
 
@@ -31,6 +32,10 @@ def create_app(config=None):
     from ras_party.views.info_view import info_view
     from ras_party.views.batch_request import batch_request
     from ras_party import error_handlers
+    from ras_party.support.json_encoder import OrjsonEncoder
+    from ras_party.support.metrics import record_request, start_request_timer
+    from ras_party.support.profiling import ProfilingMiddleware
+    from ras_party.support.session_decorator import remove_sessions
     from ras_party.views.share_survey_view import share_survey_view
     app.register_blueprint(party_view, url_prefix='/party-api/v1')
     app.register_blueprint(account_view, url_prefix='/party-api/v1')
@@ -41,20 +46,62 @@ def create_app(config=None):
     app.register_blueprint(info_view)
     app.register_blueprint(error_handlers.blueprint)
 
+    app.json_encoder = OrjsonEncoder
+    app.teardown_appcontext(remove_sessions)
+    app.before_request(start_request_timer)
+    app.after_request(record_request)
+    if app.config['PROFILING_ENABLED']:
+        app.wsgi_app = ProfilingMiddleware(app)
+
     CORS(app)
     return app
 
 
-def create_database(db_connection, db_schema):
-    from ras_party.models import models
+def database_engine_options(config):
+    """
+    The options for the engine of a postgres database, from the DATABASE_POOL_* config
 
-    def current_request():
-        return _app_ctx_stack.__ident_func__()
+    :param config: The app config
+    :rtype: dict
+    """
+    return {
+        'pool_size': config['DATABASE_POOL_SIZE'],
+        'max_overflow': config['DATABASE_MAX_OVERFLOW'],
+        'pool_recycle': config['DATABASE_POOL_RECYCLE'],
+        'pool_pre_ping': config['DATABASE_POOL_PRE_PING'],
+        'pool_timeout': config['DATABASE_POOL_TIMEOUT'],
+    }
 
-    engine = create_engine(db_connection)
-    session = scoped_session(sessionmaker(), scopefunc=current_request)
+
+def create_database(db_connection, db_schema, replica_connection=None, **engine_options):
+    from ras_party.models import models
+    from ras_party.support.db_pool import InstrumentedQueuePool
+    from ras_party.support.metrics import instrument_engine
+    from ras_party.support.session_decorator import apply_statement_timeout, session_scope
+
+    session_factory = sessionmaker()
+    if db_connection.startswith('postgres'):
+        engine = create_engine(db_connection, poolclass=InstrumentedQueuePool, pool_logging_name='primary',
+                               **engine_options)
+        event.listen(session_factory, 'after_begin', apply_statement_timeout)
+    else:
+        engine = create_engine(db_connection)
+    session = scoped_session(session_factory, scopefunc=session_scope)
     session.configure(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
     engine.session = session
+    instrument_engine(engine)
+
+    engine.replica_engine = engine.replica_session = None
+    if replica_connection:
+        logger.info("Using read replica for query only sessions")
+        engine.replica_engine = create_engine(replica_connection, poolclass=InstrumentedQueuePool,
+                                              pool_logging_name='replica', **engine_options)
+        instrument_engine(engine.replica_engine)
+        replica_session_factory = sessionmaker()
+        event.listen(replica_session_factory, 'after_begin', apply_statement_timeout)
+        engine.replica_session = scoped_session(replica_session_factory, scopefunc=session_scope)
+        engine.replica_session.configure(bind=engine.replica_engine, autoflush=False, autocommit=False,
+                                         expire_on_commit=False)
 
     logger.info("Creating database")
 
@@ -66,7 +113,9 @@ def create_database(db_connection, db_schema):
         q = exists(select([column('schema_name')]).select_from(text("information_schema.schemata"))
                    .where(text(f"schema_name = '{db_schema}'")))
 
-        if not session().query(q).scalar():
+        schema_exists = session().query(q).scalar()
+        session.remove()
+        if not schema_exists:
             logger.info("Creating schema", schema=db_schema)
             engine.execute(f"CREATE SCHEMA {db_schema}")
 
@@ -91,13 +140,16 @@ def retry_if_database_error(exception):
 @retry(retry_on_exception=retry_if_database_error, wait_fixed=2000, stop_max_delay=30000, wrap_exception=True)
 def initialise_db(app):
     # TODO: this isn't entirely safe, use a get_db() lazy initializer instead...
-    app.db = create_database(app.config['DATABASE_URI'], app.config['DATABASE_SCHEMA'])
+    app.db = create_database(app.config['DATABASE_URI'], app.config['DATABASE_SCHEMA'],
+                             replica_connection=app.config['DATABASE_REPLICA_URI'],
+                             **database_engine_options(app.config))
 
 
 if __name__ == '__main__':
     app = create_app()
     with open(app.config['PARTY_SCHEMA']) as io:
         app.config['PARTY_SCHEMA'] = loads(io.read())
+    get_schema_validator(app.config['PARTY_SCHEMA'])  # compile the schema once, at startup
 
     logger_initial_config(log_level=app.config['LOGGING_LEVEL'])
 
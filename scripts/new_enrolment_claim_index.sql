@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS enrolment_claim_idx ON partysvc.enrolment USING btree (respondent_id, business_id, survey_id COLLATE pg_catalog."default", status) TABLESPACE pg_default;
@@ -1 +1,2 @@
 update partysvc.business_attributes set trading_as = attributes ->> 'trading_as', name = attributes ->> 'name'
+where name is distinct from attributes ->> 'name' or trading_as is distinct from attributes ->> 'trading_as'
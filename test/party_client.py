@@ -1,9 +1,11 @@
 import base64
 import json
+from contextlib import contextmanager
 from urllib.parse import urlencode
 
 from flask import current_app
 from flask_testing import TestCase
+from sqlalchemy import event
 
 from logger_config import logger_initial_config
 from ras_party.models.models import Business, Respondent, BusinessRespondent, Enrolment
@@ -55,6 +57,22 @@ class PartyTestClient(TestCase):
         mock_business['id'] = business_id
         self.post_to_businesses(mock_business, 200)
 
+    @contextmanager
+    def assertMaxQueries(self, max_queries):
+        """Fails if the code in the block, e.g. a request to an endpoint, executes more than max_queries statements"""
+        statements = []
+
+        def record_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(current_app.db, 'after_cursor_execute', record_statement)
+        try:
+            yield statements
+        finally:
+            event.remove(current_app.db, 'after_cursor_execute', record_statement)
+        self.assertLessEqual(len(statements), max_queries,
+                             f'{len(statements)} statements executed:\n' + '\n'.join(statements))
+
     @property
     def auth_headers(self):
         return {
@@ -66,6 +84,11 @@ class PartyTestClient(TestCase):
         self.assertStatus(response, expected_status)
         return json.loads(response.get_data(as_text=True))
 
+    def get_metrics(self, expected_status=200):
+        response = self.client.open('/metrics', method='GET')
+        self.assertStatus(response, expected_status)
+        return response.get_data(as_text=True)
+
     def post_to_parties(self, payload, expected_status):
         response = self.client.post('/party-api/v1/parties',
                                     headers=self.auth_headers,
@@ -82,6 +105,14 @@ class PartyTestClient(TestCase):
         self.assertStatus(response, expected_status, "Response body is : " + response.get_data(as_text=True))
         return json.loads(response.get_data(as_text=True))
 
+    def post_to_businesses_stream(self, lines, expected_status=200):
+        response = self.client.post('/party-api/v1/businesses/stream',
+                                    headers=self.auth_headers,
+                                    data='\n'.join(lines),
+                                    content_type='application/x-ndjson')
+        self.assertStatus(response, expected_status, "Response body is : " + response.get_data(as_text=True))
+        return json.loads(response.get_data(as_text=True))
+
     def put_to_businesses_sample_link(self, sample_id, payload, expected_status=200):
         response = self.client.put('/party-api/v1/businesses/sample/link/{}'.format(sample_id),
                                    headers=self.auth_headers,
@@ -90,6 +121,13 @@ class PartyTestClient(TestCase):
         self.assertStatus(response, expected_status, "Response body is : " + response.get_data(as_text=True))
         return json.loads(response.get_data(as_text=True))
 
+    def get_businesses_sample_link_progress(self, sample_id, query_string=None, expected_status=200):
+        response = self.client.get(f'/party-api/v1/businesses/sample/link/{sample_id}',
+                                   query_string=query_string,
+                                   headers=self.auth_headers)
+        self.assertStatus(response, expected_status, "Response body is : " + response.get_data(as_text=True))
+        return json.loads(response.get_data(as_text=True))
+
     def post_to_respondents(self, payload, expected_status):
         response = self.client.post('/party-api/v1/respondents',
                                     headers=self.auth_headers,
@@ -142,6 +180,14 @@ class PartyTestClient(TestCase):
         self.assertStatus(response, expected_status, "Response body is : " + response.get_data(as_text=True))
         return json.loads(response.get_data(as_text=True))
 
+    def get_businesses_by_refs(self, refs, expected_status=200):
+        response = self.client.post('/party-api/v1/businesses/refs',
+                                    headers=self.auth_headers,
+                                    data=json.dumps(refs),
+                                    content_type='application/json')
+        self.assertStatus(response, expected_status, "Response body is : " + response.get_data(as_text=True))
+        return json.loads(response.get_data(as_text=True))
+
     def get_respondents_by_ids(self, ids, expected_status=200):
         url_params = tuple(("id", id_param) for id_param in ids)
         url = "/party-api/v1/respondents?"
@@ -289,8 +335,8 @@ class PartyTestClient(TestCase):
 
     def get_party_by_id_filtered_by_survey_and_enrolment(self, party_type, id,
                                                          survey_id, enrolment_statuses, expected_status=200):
-        response = self.client.get(f'/party-api/v1/parties/type/{party_type}/id/{id}?'
-                                   f'survey_id={survey_id}&enrolment_status={enrolment_statuses}',
+        query = urlencode({'survey_id': survey_id, 'enrolment_status': enrolment_statuses}, doseq=True)
+        response = self.client.get(f'/party-api/v1/parties/type/{party_type}/id/{id}?{query}',
                                    headers=self.auth_headers)
         self.assertStatus(response, expected_status, "Response body is : " + response.get_data(as_text=True))
         return json.loads(response.get_data(as_text=True))
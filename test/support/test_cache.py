@@ -0,0 +1,74 @@
+from unittest import TestCase
+
+from ras_party.support.cache import TTLCache
+
+
+class FakeTimer:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+
+    def test_entries_expire_after_ttl(self):
+        cache = TTLCache(ttl=10, timer=self.timer)
+        cache.set('key', False)
+
+        self.timer.now = 9
+        self.assertIs(cache.get('key'), False)
+        self.timer.now = 10
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache), 0)
+
+    def test_zero_ttl_disables_cache(self):
+        cache = TTLCache(ttl=0, timer=self.timer)
+        cache.set('key', 'value')
+
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache), 0)
+
+    def test_oldest_entries_evicted_when_full(self):
+        cache = TTLCache(ttl=10, maxsize=2, timer=self.timer)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_pop_removes_entry(self):
+        cache = TTLCache(ttl=10, timer=self.timer)
+        cache.set('key', 'value')
+        cache.pop('key')
+
+        self.assertIsNone(cache.get('key'))
+
+    def test_entries_can_expire_before_the_cache_ttl(self):
+        cache = TTLCache(ttl=10, timer=self.timer)
+        cache.set('short', 'value', ttl=2)
+        cache.set('long', 'value', ttl=60)
+        cache.set('expired', 'value', ttl=-1)
+
+        self.timer.now = 2
+        self.assertIsNone(cache.get('short'))
+        self.assertIsNone(cache.get('expired'))
+        self.assertEqual(cache.get('long'), 'value')
+        self.timer.now = 10
+        self.assertIsNone(cache.get('long'))
+
+    def test_pop_matching_removes_matching_entries(self):
+        cache = TTLCache(ttl=10, timer=self.timer)
+        cache.set('a', ('a@example.com', 1))
+        cache.set('b', ('b@example.com', 2))
+        cache.pop_matching(lambda value: value[1] == 1)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), ('b@example.com', 2))
@@ -0,0 +1,104 @@
+import threading
+from unittest import TestCase
+
+from requests import ConnectionError
+
+from ras_party.exceptions import DownstreamUnavailable
+from ras_party.support.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from test.mocks import MockResponse
+
+
+class FakeTimer:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def respond(status_code):
+    return MockResponse('{}', status_code=status_code)
+
+
+def fail():
+    raise ConnectionError('Connection refused')
+
+
+class TestCircuitBreaker(TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.breaker = CircuitBreaker('case', failure_threshold=2, reset_timeout=30, max_concurrent=2,
+                                      timer=self.timer)
+
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(fail)
+        self.breaker.call(respond, 503)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        with self.assertRaises(DownstreamUnavailable):
+            self.breaker.call(respond, 200)
+        self.assertEqual(self.breaker.stats(), {'state': OPEN, 'inFlight': 0, 'calls': 2, 'failures': 2,
+                                                'consecutiveFailures': 2, 'rejected': 1})
+
+    def test_client_errors_and_successes_are_not_failures(self):
+        self.breaker.call(respond, 500)
+        self.breaker.call(respond, 200)
+        self.breaker.call(respond, 500)
+        self.breaker.call(respond, 404)
+
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.consecutive_failures, 0)
+
+    def test_tries_again_after_the_reset_timeout(self):
+        self.breaker.call(respond, 500)
+        self.breaker.call(respond, 500)
+
+        self.timer.now = 30
+        self.breaker.call(respond, 500)
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(DownstreamUnavailable):
+            self.breaker.call(respond, 200)
+
+        self.timer.now = 60
+        self.breaker.call(respond, 200)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_only_one_call_is_let_through_while_half_open(self):
+        self.breaker.call(respond, 500)
+        self.breaker.call(respond, 500)
+        self.timer.now = 30
+
+        def trial():
+            self.assertEqual(self.breaker.state, HALF_OPEN)
+            with self.assertRaises(DownstreamUnavailable):
+                self.breaker.call(respond, 200)
+            return respond(200)
+
+        self.breaker.call(trial)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_rejects_calls_beyond_max_concurrent(self):
+        started, finish = threading.Barrier(3), threading.Event()
+
+        def slow():
+            started.wait()
+            finish.wait()
+            return respond(200)
+
+        threads = [threading.Thread(target=self.breaker.call, args=(slow,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        started.wait()
+
+        with self.assertRaises(DownstreamUnavailable):
+            self.breaker.call(respond, 200)
+        self.assertEqual(self.breaker.stats()['inFlight'], 2)
+
+        finish.set()
+        for thread in threads:
+            thread.join()
+        self.breaker.call(respond, 200)
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
@@ -0,0 +1,39 @@
+import uuid
+
+from flask import current_app
+from flask_testing import TestCase
+
+from ras_party.support.claims import cache_claim, cached_claim, forget_claims
+from run import create_app
+
+RESPONDENT_ID = 'B1F1C7E5-6B0C-4D7A-9D1A-2E4C3C6B7A80'
+BUSINESS_ID = '3b136c4b-7a14-4904-9e01-13364dd7b972'
+OTHER_BUSINESS_ID = '438df969-7c9c-4cd4-a89b-ac88cf0bfdf3'
+
+
+class TestClaims(TestCase):
+
+    @staticmethod
+    def create_app():
+        return create_app('TestingConfig')
+
+    def setUp(self):
+        current_app.config['CLAIM_CACHE_TTL'] = 60
+        cache_claim(RESPONDENT_ID, BUSINESS_ID, 'survey')
+        cache_claim(RESPONDENT_ID, OTHER_BUSINESS_ID, 'survey')
+
+    def test_claims_are_cached_as_they_were_asked_about(self):
+        self.assertTrue(cached_claim(RESPONDENT_ID, BUSINESS_ID, 'survey'))
+        self.assertIsNone(cached_claim(RESPONDENT_ID, BUSINESS_ID, 'other survey'))
+
+    def test_forgetting_one_claim_leaves_the_others(self):
+        forget_claims(uuid.UUID(RESPONDENT_ID), uuid.UUID(BUSINESS_ID), 'survey')
+
+        self.assertIsNone(cached_claim(RESPONDENT_ID, BUSINESS_ID, 'survey'))
+        self.assertTrue(cached_claim(RESPONDENT_ID, OTHER_BUSINESS_ID, 'survey'))
+
+    def test_forgetting_a_respondent_forgets_all_their_claims(self):
+        forget_claims(uuid.UUID(RESPONDENT_ID))
+
+        self.assertIsNone(cached_claim(RESPONDENT_ID, BUSINESS_ID, 'survey'))
+        self.assertIsNone(cached_claim(RESPONDENT_ID, OTHER_BUSINESS_ID, 'survey'))
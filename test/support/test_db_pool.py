@@ -0,0 +1,25 @@
+import sqlite3
+from unittest import TestCase
+
+from sqlalchemy.exc import TimeoutError
+
+from ras_party.support.db_pool import InstrumentedQueuePool
+
+
+class TestInstrumentedQueuePool(TestCase):
+
+    def test_stats_record_checkouts_and_timeouts(self):
+        pool = InstrumentedQueuePool(lambda: sqlite3.connect(':memory:'), pool_size=1, max_overflow=0, timeout=0.01)
+
+        connection = pool.connect()
+        with self.assertRaises(TimeoutError):
+            pool.connect()
+
+        stats = pool.stats()
+        self.assertEqual(stats['checkedOut'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['checkoutTimeouts'], 1)
+        self.assertGreaterEqual(stats['maxCheckoutWaitSeconds'], 0.01)
+
+        connection.close()
+        self.assertEqual(pool.stats()['checkedIn'], 1)
@@ -0,0 +1,39 @@
+import datetime
+import json
+import uuid
+
+from flask import jsonify
+from flask_testing import TestCase
+
+from ras_party.support.json_encoder import OrjsonEncoder
+from run import create_app
+
+
+class TestOrjsonEncoder(TestCase):
+
+    @staticmethod
+    def create_app():
+        return create_app('TestingConfig')
+
+    def test_app_uses_orjson_encoder(self):
+        self.assertIs(self.app.json_encoder, OrjsonEncoder)
+
+    def test_jsonify_serialises_uuids_and_datetimes(self):
+        party_uuid = uuid.uuid4()
+
+        response = jsonify({'id': party_uuid, 'created_on': datetime.datetime(2021, 1, 30, 12, 30)})
+
+        self.assertEqual(json.loads(response.get_data(as_text=True)),
+                         {'id': str(party_uuid), 'created_on': '2021-01-30T12:30:00'})
+
+    def test_jsonify_sorts_keys_and_falls_back_to_default(self):
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+        self.app.debug = False
+
+        class Html:
+            def __html__(self):
+                return '<p>html</p>'
+
+        response = jsonify({'b': 1, 'a': Html()})
+
+        self.assertEqual(response.get_data(as_text=True), '{"a":"<p>html</p>","b":1}\n')
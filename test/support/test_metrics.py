@@ -0,0 +1,58 @@
+import sqlite3
+from unittest import TestCase
+
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from ras_party.support.db_pool import InstrumentedQueuePool
+from ras_party.support.metrics import instrument_engine
+
+
+class TestPoolMetrics(TestCase):
+
+    @staticmethod
+    def checked_out():
+        return REGISTRY.get_sample_value('party_db_pool_checked_out_connections', {'pool': 'metrics-test'})
+
+    def test_checked_out_connections_are_counted(self):
+        pool = InstrumentedQueuePool(lambda: sqlite3.connect(':memory:'), pool_size=2, max_overflow=0,
+                                     logging_name='metrics-test')
+
+        first, second = pool.connect(), pool.connect()
+        self.assertEqual(self.checked_out(), 2)
+
+        first.close()
+        second.close()
+        self.assertEqual(self.checked_out(), 0)
+        self.assertEqual(REGISTRY.get_sample_value('party_db_pool_checkout_wait_seconds_count',
+                                                   {'pool': 'metrics-test'}), 2)
+
+
+class TestQueryMetrics(TestCase):
+
+    @staticmethod
+    def executed():
+        return REGISTRY.get_sample_value('party_db_queries_total', {'function': 'none'}) or 0
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        instrument_engine(self.engine)
+
+    def test_statements_are_counted(self):
+        executed = self.executed()
+
+        with self.engine.connect() as conn:
+            conn.execute('SELECT 1')
+            conn.execute('SELECT 2')
+
+        self.assertEqual(self.executed(), executed + 2)
+
+    def test_failed_statements_leave_no_start_time_on_the_connection(self):
+        with self.engine.connect() as conn:
+            for _ in range(3):
+                with self.assertRaises(OperationalError):
+                    conn.execute('SELECT * FROM no_such_table')
+            conn.execute('SELECT 1')
+
+            self.assertEqual(conn.info['query_started_at'], {})
@@ -0,0 +1,57 @@
+import os
+import pstats
+import tempfile
+
+from flask import current_app
+
+from ras_party.support.profiling import ProfilingMiddleware, profiling_token
+from test.party_client import PartyTestClient
+
+
+class TestProfilingMiddleware(PartyTestClient):
+
+    def setUp(self):
+        self.profile_dir = tempfile.TemporaryDirectory()
+        current_app.config['PROFILING_DIR'] = self.profile_dir.name
+        current_app.wsgi_app = ProfilingMiddleware(current_app)
+
+    def tearDown(self):
+        self.profile_dir.cleanup()
+        super().tearDown()
+
+    def test_requests_are_not_profiled_by_default(self):
+        response = self.client.get('/info')
+
+        self.assert200(response)
+        self.assertNotIn('X-Profile-File', response.headers)
+        self.assertEqual(os.listdir(self.profile_dir.name), [])
+
+    def test_sampled_requests_are_written_to_the_profile_dir(self):
+        current_app.config['PROFILING_SAMPLE_RATE'] = 1
+
+        response = self.client.get('/info')
+
+        self.assert200(response)
+        self.assertIn('version', response.json)
+        filename = response.headers['X-Profile-File']
+        self.assertEqual(os.listdir(self.profile_dir.name), [filename])
+        self.assertGreater(pstats.Stats(os.path.join(self.profile_dir.name, filename)).total_calls, 0)
+
+    def test_requests_with_a_token_can_return_the_profile(self):
+        token = profiling_token(current_app.config['SECRET_KEY'], 'response')
+
+        response = self.client.get('/info', headers={'X-Profile': token})
+
+        self.assert200(response)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn('GET /info 200 OK', response.get_data(as_text=True))
+        self.assertIn('cumulative', response.get_data(as_text=True))
+
+    def test_requests_with_an_invalid_token_are_not_profiled(self):
+        token = profiling_token('not the secret key', 'response')
+
+        response = self.client.get('/info', headers={'X-Profile': token})
+
+        self.assert200(response)
+        self.assertIn('version', response.json)
+        self.assertNotIn('X-Profile-File', response.headers)
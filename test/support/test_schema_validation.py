@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+from ras_party.support.schema_validation import get_schema_validator
+from test.fixtures import party_schema
+from test.test_data.mock_business import MockBusiness
+
+
+class TestSchemaValidation(TestCase):
+
+    def test_validator_is_compiled_once_per_schema(self):
+        validator = get_schema_validator(party_schema.schema)
+
+        self.assertIs(get_schema_validator(party_schema.schema), validator)
+        self.assertIsNot(get_schema_validator(dict(party_schema.schema)), validator)
+
+    def test_valid_party_has_no_errors(self):
+        validator = get_schema_validator(party_schema.schema)
+        party = MockBusiness().as_party()
+
+        self.assertEqual(validator.errors(party), [])
+        self.assertEqual(validator.errors(party, fast=True), [])
+
+    def test_fast_validation_reports_all_errors_for_invalid_party(self):
+        validator = get_schema_validator(party_schema.schema)
+        party = {'sampleUnitType': 'X'}
+
+        errors = validator.errors(party, fast=True)
+
+        self.assertEqual(errors, validator.errors(party))
+        self.assertEqual(len(errors), 3)
@@ -0,0 +1,46 @@
+from flask import current_app
+from flask_testing import TestCase
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.exceptions import InternalServerError
+
+from ras_party.support.verification import decode_email_token, generate_email_token
+from run import create_app
+
+
+class TestVerification(TestCase):
+
+    @staticmethod
+    def create_app():
+        return create_app('TestingConfig')
+
+    def test_token_round_trip(self):
+        token = generate_email_token('test@example.test')
+
+        self.assertEqual(decode_email_token(token, 60), 'test@example.test')
+
+    def test_tokens_signed_with_a_fallback_key_are_accepted(self):
+        current_app.config['SECRET_KEY_FALLBACKS'] = ['old-key']
+        token = URLSafeTimedSerializer('old-key').dumps('test@example.test',
+                                                        salt=current_app.config['EMAIL_TOKEN_SALT'])
+
+        self.assertEqual(decode_email_token(token), 'test@example.test')
+
+    def test_tokens_signed_with_an_unknown_key_are_rejected(self):
+        current_app.config['SECRET_KEY_FALLBACKS'] = ['old-key']
+        token = URLSafeTimedSerializer('other-key').dumps('test@example.test',
+                                                          salt=current_app.config['EMAIL_TOKEN_SALT'])
+
+        with self.assertRaises(BadSignature):
+            decode_email_token(token)
+
+    def test_expired_tokens_are_rejected(self):
+        token = generate_email_token('test@example.test')
+
+        with self.assertRaises(SignatureExpired):
+            decode_email_token(token, -1)
+
+    def test_missing_secret_key_raises_internal_server_error(self):
+        current_app.config['SECRET_KEY'] = None
+
+        with self.assertRaises(InternalServerError):
+            generate_email_token('test@example.test')
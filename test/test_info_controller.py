@@ -7,6 +7,19 @@ class TestParties(PartyTestClient):
         response = self.get_info()
         self.assertIn('name', response)
         self.assertIn('version', response)
+        self.assertIn('checkoutWaitSeconds', response['databasePool'])
+
+    def test_metrics_endpoint(self):
+        self.get_info()
+        metrics = self.get_metrics()
+        self.assertIn('party_http_request_duration_seconds_count{endpoint="/info",method="GET",status="200"}', metrics)
+        self.assertIn('party_db_pool_checked_out_connections{pool="primary"}', metrics)
+
+    def test_metrics_count_queries_by_decorated_function(self):
+        self.get_party_by_id('B', '3b136c4b-7a14-4904-9e01-13364dd7b972', expected_status=404)
+        metrics = self.get_metrics()
+        self.assertIn('party_db_queries_total{function="ras_party.controllers.party_controller.get_party_by_id"}',
+                      metrics)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,38 @@
+import json
+import uuid
+from unittest import TestCase
+from unittest.mock import patch
+
+from structlog import DropEvent
+
+from logger_config import orjson_dumps, sample_events, truncate_values
+
+
+class TestLoggerConfig(TestCase):
+
+    def test_large_values_are_truncated(self):
+        truncate = truncate_values(max_items=2, max_length=5)
+
+        event_dict = truncate(None, 'info', {'event': 'Querying a long event name', 'ids': [1, 2, 3, 4],
+                                             'email': 'a@example.com', 'count': 4})
+
+        self.assertEqual(event_dict, {'event': 'Querying a long event name', 'ids': [1, 2, '... 2 more'],
+                                      'email': 'a@exa... 8 more characters', 'count': 4})
+
+    def test_events_are_sampled_by_level(self):
+        sample = sample_events({'debug': 0.25})
+
+        with patch('logger_config.random.random', return_value=0.5):
+            with self.assertRaises(DropEvent):
+                sample(None, 'debug', {'event': 'Querying'})
+            self.assertEqual(sample(None, 'info', {'event': 'Querying'}), {'event': 'Querying'})
+        with patch('logger_config.random.random', return_value=0.1):
+            self.assertEqual(sample(None, 'debug', {'event': 'Querying'}), {'event': 'Querying'})
+
+    def test_events_are_rendered_as_json(self):
+        party_uuid = uuid.uuid4()
+
+        rendered = json.loads(orjson_dumps({'event': 'Querying', 'party_uuid': party_uuid, 'other': object}))
+
+        self.assertEqual(rendered['party_uuid'], str(party_uuid))
+        self.assertEqual(rendered['other'], repr(object))
@@ -27,3 +27,17 @@ class TestModels(TestCase):
         business.add_versioned_attributes(party_data)
 
         self.assertEqual(len(business.attributes), 2)
+
+    def test_business_name_and_trading_as_columns_match_attributes(self):
+        party_data = {'sampleUnitType': 'B',
+                      'sampleUnitRef': '428533294',
+                      'sampleSummaryId': '428533294',
+                      'attributes': {'runame1': 'Runame-1', 'runame2': '', 'runame3': '  ',
+                                     'tradstyle1': 'Tradstyle-1  Ltd'}}
+        business = Business.from_party_dict(party_data)
+        business_attributes = business.attributes[0]
+
+        self.assertEqual(business_attributes.name, 'Runame-1')
+        self.assertEqual(business_attributes.trading_as, 'Tradstyle-1 Ltd')
+        self.assertEqual(business_attributes.attributes['name'], business_attributes.name)
+        self.assertEqual(business_attributes.attributes['trading_as'], business_attributes.trading_as)
@@ -2,7 +2,9 @@ import json
 import os
 import uuid
 
-from ras_party.controllers import account_controller
+from flask import current_app
+
+from ras_party.controllers import account_controller, business_controller
 from ras_party.controllers.queries import query_respondent_by_party_uuid, query_business_by_party_uuid
 from ras_party.models.models import BusinessRespondent, Enrolment, Respondent, RespondentStatus
 from ras_party.support.requests_wrapper import Requests
@@ -208,6 +210,38 @@ class TestParties(PartyTestClient):
 
         self.put_to_businesses_sample_link(sample_id, put_data, 200)
 
+    def test_put_business_sample_link_links_in_chunks_and_can_be_repeated(self):
+        self.app.config['SAMPLE_LINK_CHUNK_SIZE'] = 2
+        sample_id = str(uuid.uuid4())
+        for _ in range(3):
+            self.post_to_businesses(MockBusiness().attributes(sampleSummaryId=sample_id).as_business(), 200)
+        put_data = {'collectionExerciseId': 'somecollectionexcid'}
+
+        self.assertEqual(business_controller.businesses_sample_ce_link(sample_id, put_data),
+                         {'linked': 3, 'chunks': 2})
+        self.assertEqual(business_controller.businesses_sample_ce_link(sample_id, put_data),
+                         {'linked': 0, 'chunks': 0})
+
+        progress = self.get_businesses_sample_link_progress(sample_id, {'collectionExerciseId': 'somecollectionexcid'})
+        self.assertEqual(progress['total'], 3)
+        self.assertEqual(progress['linked'], 3)
+
+    def test_get_business_sample_link_progress(self):
+        mock_business = MockBusiness().as_business()
+        self.post_to_businesses(mock_business, 200)
+        sample_id = mock_business['sampleSummaryId']
+
+        progress = self.get_businesses_sample_link_progress(sample_id)
+        self.assertEqual(progress, {'sampleSummaryId': sample_id, 'collectionExerciseId': None,
+                                    'total': 1, 'linked': 0})
+
+        self.put_to_businesses_sample_link(sample_id, {'collectionExerciseId': 'somecollectionexcid'}, 200)
+
+        self.assertEqual(self.get_businesses_sample_link_progress(sample_id)['linked'], 1)
+        progress = self.get_businesses_sample_link_progress(sample_id,
+                                                            {'collectionExerciseId': 'anothercollectionexcid'})
+        self.assertEqual(progress['linked'], 0)
+
     def test_put_business_sample_link_returns_400_when_no_ce(self):
         mock_business = MockBusiness().as_business()
         sample_id = mock_business['sampleSummaryId']
@@ -233,6 +267,81 @@ class TestParties(PartyTestClient):
         del expected['id']
         self.assertDictEqual(expected, actual)
 
+    def test_get_business_by_ref_includes_respondents_and_their_enrolments(self):
+        self.populate_with_respondent(respondent=self.mock_respondent_with_id)
+        mock_business = MockBusiness().as_business()
+        mock_business['id'] = DEFAULT_BUSINESS_UUID
+        self.post_to_businesses(mock_business, 200)
+        self._make_business_attributes_active(mock_business)
+        self.associate_business_and_respondent(business_id=DEFAULT_BUSINESS_UUID,
+                                               respondent_id=self.mock_respondent_with_id['id'])
+        self.populate_with_enrolment()
+
+        business = self.get_business_by_ref(mock_business['sampleUnitRef'])
+
+        self.assertEqual(business['associations'], [{
+            'partyId': self.mock_respondent_with_id['id'],
+            'businessRespondentStatus': 'CREATED',
+            'enrolments': [{'surveyId': DEFAULT_SURVEY_UUID, 'enrolmentStatus': 'ENABLED'}]
+        }])
+
+    def test_get_business_by_ref_is_cached_until_its_active_attributes_change(self):
+        current_app.config['BUSINESS_REF_CACHE_TTL'] = 60
+        mock_business = MockBusiness().as_business()
+        self.post_to_businesses(mock_business, 200)
+        self._make_business_attributes_active(mock_business)
+        ru_ref = mock_business['sampleUnitRef']
+        business = self.get_business_by_ref(ru_ref)
+
+        with self.assertMaxQueries(1):
+            self.assertEqual(self.get_business_by_ref(ru_ref), business)
+
+        mock_business.update(sampleSummaryId='another-sample', runame1='Another')
+        self.post_to_businesses(mock_business, 200)
+        self.assertEqual(self.get_business_by_ref(ru_ref), business)
+
+        self.put_to_businesses_sample_link('another-sample', {'collectionExerciseId': 'another_id'})
+        business = self.get_business_by_ref(ru_ref)
+        self.assertEqual(business['sampleSummaryId'], 'another-sample')
+        self.assertEqual(business['name'], 'Another Runame-2 Runame-3')
+
+    def test_cached_business_by_ref_is_refreshed_when_changed_by_another_process(self):
+        current_app.config['BUSINESS_REF_CACHE_TTL'] = 60
+        mock_business = MockBusiness().as_business()
+        self.post_to_businesses(mock_business, 200)
+        self._make_business_attributes_active(mock_business)
+        ru_ref = mock_business['sampleUnitRef']
+        mock_business.update(sampleSummaryId='another-sample', runame1='Another')
+        self.post_to_businesses(mock_business, 200)
+        self.get_business_by_ref(ru_ref)
+
+        # Linking a chunk directly leaves this process' cache alone, as another process linking the sample would
+        with self.app.app_context():
+            business_controller._link_sample_chunk('another-sample', 'another_id', 0, 100)
+
+        self.assertEqual(self.get_business_by_ref(ru_ref)['sampleSummaryId'], 'another-sample')
+
+    def test_get_businesses_by_refs_returns_known_active_businesses_in_order(self):
+        refs = []
+        for _ in range(3):
+            mock_business = MockBusiness().as_business()
+            self.post_to_businesses(mock_business, 200)
+            self._make_business_attributes_active(mock_business)
+            refs.append(mock_business['sampleUnitRef'])
+        inactive_business = MockBusiness().as_business()
+        self.post_to_businesses(inactive_business, 200)
+
+        with self.assertMaxQueries(2):
+            businesses = self.get_businesses_by_refs([refs[2], '123', inactive_business['sampleUnitRef'], refs[0],
+                                                      refs[1], refs[0]])
+
+        self.assertEqual([business['sampleUnitRef'] for business in businesses], [refs[2], refs[0], refs[1]])
+        self.assertEqual(businesses[1], self.get_business_by_ref(refs[0]))
+
+    def test_get_businesses_by_refs_returns_400_when_refs_are_not_a_list_of_strings(self):
+        self.get_businesses_by_refs({'ref': '123'}, 400)
+        self.get_businesses_by_refs([123], 400)
+
     def test_get_party_by_id_returns_correct_representation(self):
         mock_party_b = MockBusiness().as_party()
         party_id_b = self.post_to_parties(mock_party_b, 200)['id']
@@ -244,6 +353,22 @@ class TestParties(PartyTestClient):
         for x in mock_party_b:
             self.assertTrue(x in response)
 
+    def test_responses_summarise_the_database_queries_outside_production(self):
+        mock_party_b = MockBusiness().as_party()
+        party_id_b = self.post_to_parties(mock_party_b, 200)['id']
+        self._make_business_attributes_active(mock_party_b)
+
+        response = self.client.get(f'/party-api/v1/parties/type/B/id/{party_id_b}', headers=self.auth_headers)
+
+        self.assertGreater(int(response.headers['X-Database-Query-Count']), 0)
+        self.assertGreater(float(response.headers['X-Database-Query-Seconds']), 0)
+        self.assertLessEqual(float(response.headers['X-Database-Slowest-Query-Seconds']),
+                             float(response.headers['X-Database-Query-Seconds']))
+
+        current_app.config['DATABASE_QUERY_HEADERS'] = False
+        response = self.client.get(f'/party-api/v1/parties/type/B/id/{party_id_b}', headers=self.auth_headers)
+        self.assertNotIn('X-Database-Query-Count', response.headers)
+
     def test_get_party_by_id_no_active_attributes_returns_404(self):
         mock_party_b = MockBusiness().as_party()
         party_id_b = self.post_to_parties(mock_party_b, 200)['id']
@@ -284,6 +409,36 @@ class TestParties(PartyTestClient):
         self.assertEqual(len(businesses()), 1)
         self.assertEqual(response_2['attributes']['version'], 2)
 
+    def test_post_businesses_stream_adds_to_db_in_chunks(self):
+        self.app.config['BUSINESS_INGEST_CHUNK_SIZE'] = 2
+        mock_businesses = [MockBusiness().as_business() for _ in range(3)]
+        lines = [json.dumps(mock_business) for mock_business in mock_businesses]
+
+        response = self.post_to_businesses_stream(lines)
+
+        self.assertEqual(response['received'], 3)
+        self.assertEqual(response['created'], 3)
+        self.assertEqual(response['updated'], 0)
+        self.assertEqual(response['rejected'], 0)
+        self.assertEqual(response['chunks'], 2)
+        self.assertEqual(len(businesses()), 3)
+
+    def test_post_businesses_stream_updates_existing_and_rejects_invalid_rows(self):
+        mock_business = MockBusiness().attributes(version=1)
+        self.post_to_businesses(mock_business.as_business(), 200)
+        mock_business.attributes(version=2)
+        lines = [json.dumps(mock_business.as_business()), '{"bad": "schema"}', 'not json', '']
+
+        response = self.post_to_businesses_stream(lines)
+
+        self.assertEqual(response['received'], 3)
+        self.assertEqual(response['created'], 0)
+        self.assertEqual(response['updated'], 1)
+        self.assertEqual(response['rejected'], 2)
+        self.assertEqual([error['line'] for error in response['errors']], [2, 3])
+        self.assertEqual(len(businesses()), 1)
+        self.assertEqual(len(businesses()[0].attributes), 2)
+
     def test_post_businesses_with_no_body_returns_400(self):
         self.post_to_businesses(None, 400)
 
@@ -326,9 +481,13 @@ class TestParties(PartyTestClient):
         self.associate_business_and_respondent(business_id=mock_business['id'],
                                                respondent_id=self.mock_respondent_with_id['id'])  # NOQA
         self.populate_with_enrolment()  # NOQA
-        self.get_party_by_id_filtered_by_survey_and_enrolment('B', mock_business['id'],
-                                                              DEFAULT_SURVEY_UUID,
-                                                              ['ENABLED', 'PENDING'])
+        party = self.get_party_by_id_filtered_by_survey_and_enrolment('B', mock_business['id'],
+                                                                      DEFAULT_SURVEY_UUID,
+                                                                      ['ENABLED', 'PENDING'])
+        self.assertEqual(party['associations'], [{
+            'partyId': self.mock_respondent_with_id['id'],
+            'enrolments': [{'surveyId': DEFAULT_SURVEY_UUID, 'enrolmentStatus': 'ENABLED'}]
+        }])
 
     def test_get_party_by_survey_id_and_enrolment_statuses_with_invalid_enrolment(self):
         self.populate_with_respondent(respondent=self.mock_respondent_with_id)
@@ -339,9 +498,32 @@ class TestParties(PartyTestClient):
         self.associate_business_and_respondent(business_id=mock_business['id'],
                                                respondent_id=self.mock_respondent_with_id['id'])
         self.populate_with_enrolment(enrolment=self.mock_enrolment_disabled)  # NOQA
-        self.get_party_by_id_filtered_by_survey_and_enrolment('B', mock_business['id'],
-                                                              DEFAULT_SURVEY_UUID,
-                                                              ['ENABLED', 'PENDING'])
+        party = self.get_party_by_id_filtered_by_survey_and_enrolment('B', mock_business['id'],
+                                                                      DEFAULT_SURVEY_UUID,
+                                                                      ['ENABLED', 'PENDING'])
+        self.assertEqual(party['associations'], [])
+
+    def test_get_respondent_party_by_survey_id_with_any_enrolment_status(self):
+        self.populate_with_respondent(respondent=self.mock_respondent_with_id)
+        mock_business = MockBusiness().as_business()
+        mock_business['id'] = DEFAULT_BUSINESS_UUID
+        self.post_to_businesses(mock_business, 200)
+        self._make_business_attributes_active(mock_business=mock_business)
+        self.associate_business_and_respondent(business_id=mock_business['id'],
+                                               respondent_id=self.mock_respondent_with_id['id'])
+        self.populate_with_enrolment(enrolment=self.mock_enrolment_disabled)
+
+        party = self.get_party_by_id_filtered_by_survey_and_enrolment('BI',
+                                                                      self.mock_respondent_with_id['id'],
+                                                                      DEFAULT_SURVEY_UUID, [])
+        self.assertEqual(party['associations'], [{
+            'partyId': DEFAULT_BUSINESS_UUID,
+            'enrolments': [{'surveyId': DEFAULT_SURVEY_UUID, 'enrolmentStatus': 'DISABLED'}]
+        }])
+        party = self.get_party_by_id_filtered_by_survey_and_enrolment('BI',
+                                                                      self.mock_respondent_with_id['id'],
+                                                                      'another-survey', [])
+        self.assertEqual(party['associations'], [])
 
 
 if __name__ == '__main__':
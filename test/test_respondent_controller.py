@@ -1,9 +1,10 @@
 # pylint: disable=no-value-for-parameter
 
 import json
+import threading
 import uuid
 from unittest import mock
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, call, patch
 
 from flask import current_app
 from itsdangerous import URLSafeTimedSerializer
@@ -12,16 +13,20 @@ from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.exceptions import BadRequest, InternalServerError, NotFound
 
 from ras_party.controllers import account_controller, respondent_controller
-from ras_party.controllers.queries import query_respondent_by_party_uuid, query_business_by_party_uuid
+from ras_party.controllers.iac_controller import disable_iac
+from ras_party.controllers.queries import query_business_by_party_uuid, query_respondent_by_email, \
+    query_respondent_by_party_uuid
 from ras_party.exceptions import RasNotifyError
 from ras_party.models.models import Business, BusinessRespondent, Enrolment, RespondentStatus, Respondent, \
     PendingEnrolment
+from ras_party.support.json_encoder import OrjsonEncoder
 from ras_party.support.public_website import PublicWebsite
 from ras_party.support.requests_wrapper import Requests
 from ras_party.support.session_decorator import with_db_session
 from ras_party.support.verification import generate_email_token
 from test.mocks import MockRequests, MockResponse
 from test.party_client import PartyTestClient, respondents, businesses, business_respondent_associations, enrolments
+from test.test_data.mock_business import MockBusiness
 from test.test_data.mock_enrolment import MockEnrolmentEnabled, MockEnrolmentDisabled, MockEnrolmentPending
 from test.test_data.mock_respondent import MockRespondent, MockRespondentWithId, \
     MockRespondentWithIdActive, MockRespondentWithIdSuspended, MockRespondentWithPendingEmail
@@ -189,6 +194,17 @@ class TestRespondents(PartyTestClient):
         self.assertEqual(len(response), 1)
         self.assertEqual(res_dict[respondent_1.party_uuid]['emailAddress'], 'res1@example.com')
 
+    def test_get_respondent_by_ids_makes_the_same_queries_however_many_respondents_there_are(self):
+        ids = []
+        for i in range(3):
+            respondent = MockRespondent().attributes(emailAddress=f'res{i}@example.com').as_respondent()
+            ids.append(self.populate_with_respondent(respondent=respondent).party_uuid)
+
+        with self.assertMaxQueries(2):
+            response = self.get_respondents_by_ids(ids)
+
+        self.assertEqual(len(response), 3)
+
     def test_get_respondent_by_ids_with_only_unknown_id_returns_none(self):
         self.populate_with_respondent()
         party_uuid = str(uuid.uuid4())
@@ -1002,6 +1018,30 @@ class TestRespondents(PartyTestClient):
             account_controller.verify_token(token)
             query.assert_called_once_with('test@example.test', db.session())
 
+    def test_verified_token_is_cached_when_enabled(self):
+        current_app.config['VERIFIED_TOKEN_CACHE_TTL'] = 60
+        current_app.config['EMAIL_TOKEN_EXPIRY'] = 3600
+        respondent = self.populate_with_respondent()
+        token = self.generate_valid_token_from_email(respondent.email_address)
+        self.verify_token(token)
+
+        with patch('ras_party.controllers.account_controller.decode_email_token') as decode, \
+                patch('ras_party.controllers.account_controller.query_respondent_by_email') as query:
+            self.verify_token(token)
+            decode.assert_not_called()
+            query.assert_not_called()
+
+    def test_verified_token_is_forgotten_when_respondent_is_deleted(self):
+        current_app.config['VERIFIED_TOKEN_CACHE_TTL'] = 60
+        current_app.config['EMAIL_TOKEN_EXPIRY'] = 3600
+        respondent = self.populate_with_respondent()
+        token = self.generate_valid_token_from_email(respondent.email_address)
+        self.verify_token(token)
+
+        respondent_controller.delete_respondent_by_email(respondent.email_address)
+
+        self.verify_token(token, expected_status=404)
+
     def test_put_respondent_email_returns_400_when_no_email(self):
         self.put_email_to_respondents({}, 400)
 
@@ -1153,6 +1193,24 @@ class TestRespondents(PartyTestClient):
         # Then status code 400 is returned
         self.post_to_respondents(self.mock_respondent, 400)
 
+    def test_post_respondent_fails_fast_once_the_iac_service_keeps_failing(self):
+        # Given the IAC service has started failing
+        current_app.config['CIRCUIT_BREAKER_FAILURE_THRESHOLD'] = 1
+
+        def mock_get_iac(*args, **kwargs):
+            return MockResponse('{}', status_code=500)
+
+        self.mock_requests.get = mock_get_iac
+        self.post_to_respondents(self.mock_respondent, 400)
+        # When a new respondent is posted again
+        # Then the IAC service isn't called and status code 503 is returned (the case, requested alongside the iac, may
+        # or may not be)
+        self.mock_requests.get = MagicMock()
+        self.post_to_respondents(self.mock_respondent, 503)
+        self.assertNotIn(call('http://mockhost:6666/iacs/fb747cq725lj', auth=ANY, timeout=ANY),
+                         self.mock_requests.get.call_args_list)
+        self.assertEqual(self.get_info()['downstreamServices']['mockhost:6666']['state'], 'OPEN')
+
     def test_post_respondent_requests_the_iac_details(self):
         # Given there is a business (related to the IAC code case context)
         self.populate_with_business()
@@ -1161,6 +1219,102 @@ class TestRespondents(PartyTestClient):
         # Then the case service is called with the supplied IAC code
         self.mock_requests.get.assert_called_once_with('http://mockhost:1111/cases/iac/fb747cq725lj')
 
+    def test_post_respondent_requests_the_iac_and_case_at_the_same_time(self):
+        # Given each of the iac and case requests waits for the other to have been made
+        self.populate_with_business()
+        both_requested = threading.Barrier(2, timeout=5)
+        get = self.mock_requests.get
+
+        def mock_get(uri, *args, **kwargs):
+            if '/iacs/' in uri or '/cases/iac/' in uri:
+                both_requested.wait()
+            return get(uri, *args, **kwargs)
+
+        self.mock_requests.get = mock_get
+        # When a new respondent is posted
+        # Then it's registered, rather than the first request timing out waiting for the second
+        self.post_to_respondents(self.mock_respondent, 200)
+
+    def test_post_respondent_checks_the_email_address_while_the_iac_and_case_are_requested(self):
+        # Given the email address query and the iac and case requests each wait for the others to have been made
+        self.populate_with_business()
+        all_started = threading.Barrier(3, timeout=5)
+        get = self.mock_requests.get
+
+        def mock_get(uri, *args, **kwargs):
+            if '/iacs/' in uri or '/cases/iac/' in uri:
+                all_started.wait()
+            return get(uri, *args, **kwargs)
+
+        def mock_query_respondent_by_email(email, session):
+            all_started.wait()
+            return query_respondent_by_email(email, session)
+
+        self.mock_requests.get = mock_get
+        # When a new respondent is posted
+        # Then it's registered, rather than the barrier timing out
+        with patch('ras_party.controllers.account_controller.query_respondent_by_email',
+                   mock_query_respondent_by_email):
+            self.post_to_respondents(self.mock_respondent, 200)
+
+    def test_post_respondent_looks_up_the_business_while_the_collection_exercise_is_requested(self):
+        # Given the business lookup and the collection exercise request each wait for the other to have been made
+        self.populate_with_business()
+        both_started = threading.Barrier(2, timeout=5)
+        get = self.mock_requests.get
+
+        def mock_get(uri, *args, **kwargs):
+            if '/collectionexercises/' in uri:
+                both_started.wait()
+            return get(uri, *args, **kwargs)
+
+        def mock_query_business_by_party_uuid(party_uuid, session):
+            both_started.wait()
+            return query_business_by_party_uuid(party_uuid, session)
+
+        self.mock_requests.get = mock_get
+        # When a new respondent is posted
+        # Then it's registered, rather than the barrier timing out
+        with patch('ras_party.controllers.account_controller.query_business_by_party_uuid',
+                   mock_query_business_by_party_uuid):
+            self.post_to_respondents(self.mock_respondent, 200)
+
+    def test_enrolment_code_context_is_resolved_once_until_the_code_is_disabled(self):
+        current_app.config['ENROLMENT_CODE_CACHE_TTL'] = 60
+        case_url = 'http://mockhost:1111/cases/iac/fb747cq725lj'
+        iac_url = 'http://mockhost:6666/iacs/fb747cq725lj'
+        with self.app.app_context():
+            context = account_controller.get_enrolment_code_context('fb747cq725lj')
+        with self.app.app_context():
+            self.assertEqual(account_controller.get_enrolment_code_context('fb747cq725lj'), context)
+        self.mock_requests.get.assert_called_once_with(case_url)
+        self.assertEqual(self.mock_requests.get._calls[iac_url], 2)
+
+        with self.app.app_context():
+            disable_iac('fb747cq725lj', context['case']['id'])
+            account_controller.get_enrolment_code_context('fb747cq725lj')
+        self.assertEqual(self.mock_requests.get._calls[case_url], 2)
+
+    def test_cached_enrolment_code_context_is_refused_once_the_code_is_used_elsewhere(self):
+        # Given the code's context is cached
+        current_app.config['ENROLMENT_CODE_CACHE_TTL'] = 60
+        with self.app.app_context():
+            account_controller.get_enrolment_code_context('fb747cq725lj')
+
+        # When the code has been used through another process, which disabled it in its own cache only
+        get = self.mock_requests.get
+
+        def mock_get(uri, *args, **kwargs):
+            if '/iacs/' in uri:
+                return MockResponse('{"active": false}')
+            return get(uri, *args, **kwargs)
+
+        self.mock_requests.get = mock_get
+        # Then it's no longer active here either
+        with self.app.app_context():
+            with self.assertRaises(BadRequest):
+                account_controller.get_enrolment_code_context('fb747cq725lj')
+
     def test_post_valid_respondent_adds_to_db(self):
         # Given the database contains no respondents
         self.assertEqual(len(respondents()), 0)
@@ -1206,6 +1360,27 @@ class TestRespondents(PartyTestClient):
         self.assertEqual(str(enrolment.business_respondent.business.party_uuid),
                          DEFAULT_BUSINESS_UUID)
 
+    def test_projected_representations_match_orm_representations(self):
+        # Given a respondent enrolled on a business with active attributes
+        mock_business = MockBusiness().as_business()
+        mock_business['id'] = DEFAULT_BUSINESS_UUID
+        self.post_to_businesses(mock_business, 200)
+        self.put_to_businesses_sample_link(mock_business['sampleSummaryId'], {'collectionExerciseId': 'test_id'}, 200)
+        respondent_id = self.post_to_respondents(self.mock_respondent, 200)['id']
+        # When they're fetched by id
+        respondent = self.get_respondents_by_ids([respondent_id])
+        business = self.get_businesses_by_ids([DEFAULT_BUSINESS_UUID])
+        # Then the dicts built from columns match the ones built from the ORM instances
+        encoder = OrjsonEncoder()
+        with self.app.app_context():
+            session = current_app.db.session()
+            expected_respondent = query_respondent_by_party_uuid(respondent_id, session).to_respondent_dict()
+            expected_business = query_business_by_party_uuid(DEFAULT_BUSINESS_UUID, session).to_business_summary_dict()
+            current_app.db.session.remove()
+        self.assertEqual(respondent, [json.loads(encoder.encode(expected_respondent))])
+        self.assertEqual(business, [json.loads(encoder.encode(expected_business))])
+        self.assertEqual(len(respondent[0]['associations'][0]['enrolments']), 1)
+
     def test_associations_populated_when_respondent_created(self):
         # Given there is a respondent associated with a business
         self.populate_with_respondent(respondent=self.mock_respondent_with_id)
@@ -1625,6 +1800,78 @@ class TestRespondents(PartyTestClient):
                                        expected_status=200,
                                        expected_result="Invalid")
 
+    def test_validate_claim_returns_404_if_respondent_does_not_exist(self):
+        self.validate_respondent_claim(respondent_id=DEFAULT_RESPONDENT_UUID,
+                                       business_id=DEFAULT_BUSINESS_UUID,
+                                       survey_id=DEFAULT_SURVEY_UUID,
+                                       expected_status=404)
+
+    def test_validate_claim_is_cached_when_enabled(self):
+        self.app.config['CLAIM_CACHE_TTL'] = 60
+        self.populate_with_respondent(respondent=self.mock_respondent_with_id_active)
+        self.populate_with_business()
+        self.associate_business_and_respondent(business_id=DEFAULT_BUSINESS_UUID,
+                                               respondent_id=DEFAULT_RESPONDENT_UUID)
+        self.populate_with_enrolment(enrolment=self.mock_enrolment_enabled)
+        self.validate_respondent_claim(respondent_id=DEFAULT_RESPONDENT_UUID,
+                                       business_id=DEFAULT_BUSINESS_UUID,
+                                       survey_id=DEFAULT_SURVEY_UUID,
+                                       expected_status=200,
+                                       expected_result="Valid")
+
+        with patch('ras_party.controllers.respondent_controller.query_respondent_claim') as query:
+            self.validate_respondent_claim(respondent_id=DEFAULT_RESPONDENT_UUID,
+                                           business_id=DEFAULT_BUSINESS_UUID,
+                                           survey_id=DEFAULT_SURVEY_UUID,
+                                           expected_status=200,
+                                           expected_result="Valid")
+            query.assert_not_called()
+
+    def _populate_with_claim(self, enrolment=None):
+        self.app.config['CLAIM_CACHE_TTL'] = 60
+        self.populate_with_respondent(respondent=self.mock_respondent_with_id_active)
+        self.populate_with_business()
+        self.associate_business_and_respondent(business_id=DEFAULT_BUSINESS_UUID,
+                                               respondent_id=DEFAULT_RESPONDENT_UUID)
+        if enrolment:
+            self.populate_with_enrolment(enrolment=enrolment)
+
+    def _validate_claim(self, expected_result):
+        self.validate_respondent_claim(respondent_id=DEFAULT_RESPONDENT_UUID,
+                                       business_id=DEFAULT_BUSINESS_UUID,
+                                       survey_id=DEFAULT_SURVEY_UUID,
+                                       expected_status=200,
+                                       expected_result=expected_result)
+
+    def test_validate_claim_is_not_cached_while_it_is_not_held(self):
+        self._populate_with_claim()
+        self._validate_claim("Invalid")
+
+        self.populate_with_enrolment(enrolment=self.mock_enrolment_enabled)
+
+        self._validate_claim("Valid")
+
+    def test_cached_claim_is_dropped_when_the_enrolment_is_disabled(self):
+        self._populate_with_claim(enrolment=self.mock_enrolment_enabled)
+        self._validate_claim("Valid")
+
+        self.put_enrolment_status({'respondent_id': DEFAULT_RESPONDENT_UUID,
+                                   'business_id': DEFAULT_BUSINESS_UUID,
+                                   'survey_id': DEFAULT_SURVEY_UUID,
+                                   'change_flag': 'DISABLED'})
+
+        self._validate_claim("Invalid")
+
+    def test_cached_claim_is_dropped_when_the_respondent_is_suspended(self):
+        self._populate_with_claim(enrolment=self.mock_enrolment_enabled)
+        self._validate_claim("Valid")
+
+        self.put_respondent_account_status({'respondent_id': DEFAULT_RESPONDENT_UUID,
+                                            'email_address': self.mock_respondent_with_id_active['emailAddress'],
+                                            'status_change': 'SUSPENDED'}, DEFAULT_RESPONDENT_UUID)
+
+        self._validate_claim("Invalid")
+
     def test_account_view_auth_error_calls_rollback(self):
         # Given the database contains no enrolments
         self.assertEqual(len(enrolments()), 0)
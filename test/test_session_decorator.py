@@ -1,7 +1,15 @@
 import unittest
+import uuid
 from unittest.mock import patch, Mock
 
-from ras_party.support.session_decorator import handle_session
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from ras_party.models.models import Business
+from ras_party.support.session_decorator import handle_session, handle_query_only_session, session_scope, \
+    with_bulk_db_session, with_db_session, with_query_only_db_session
+from test.party_client import PartyTestClient, businesses
 
 from app import create_app
 
@@ -39,3 +47,151 @@ class TestSessionDecorator(unittest.TestCase):
                 # Then
                 session_instance.rollback.assert_called_once()
                 current_app.db.session.remove.assert_called_once()
+
+    def test_query_only_session_reads_from_replica(self):
+        # Given
+        def read(session): return session
+        # When
+        with self.app.app_context():
+            with patch('ras_party.support.session_decorator.current_app') as current_app:
+                current_app.db.session.registry.has.return_value = False
+                session = handle_query_only_session(read, [], {})
+
+                # Then
+                self.assertIs(session, current_app.db.replica_session.return_value)
+                current_app.db.replica_session.remove.assert_called_once()
+                current_app.db.session.assert_not_called()
+
+    def test_query_only_session_reads_from_primary_after_commit(self):
+        # Given
+        def read(session): return session
+        # When
+        with self.app.app_context():
+            with patch('ras_party.support.session_decorator.current_app') as current_app:
+                current_app.db.session.registry.has.return_value = False
+                handle_session(read, [], {})
+                session = handle_query_only_session(read, [], {})
+
+                # Then
+                self.assertIs(session, current_app.db.session.return_value)
+                current_app.db.replica_session.assert_not_called()
+
+    def test_session_scope_is_the_app_context(self):
+        with self.app.app_context():
+            scope = session_scope()
+            self.assertEqual(session_scope(), scope)
+            with self.app.app_context():
+                self.assertNotEqual(session_scope(), scope)
+        self.assertEqual(session_scope()[0], 'thread')
+
+    def test_sessions_removed_on_app_context_teardown(self):
+        db = Mock()
+        self.app.db = db
+        with self.app.app_context():
+            pass
+
+        db.session.remove.assert_called_once()
+        db.replica_session.remove.assert_called_once()
+
+
+@with_db_session
+def add_business(business_ref, session, fail=False):
+    session.add(Business(party_uuid=uuid.uuid4(), business_ref=business_ref))
+    if fail:
+        raise ValueError(business_ref)
+    return session
+
+
+@with_query_only_db_session
+def current_session(session):
+    return session
+
+
+@with_query_only_db_session
+def add_business_while_reading(business_ref, session):
+    return session, add_business(business_ref)
+
+
+class TestNestedSessions(PartyTestClient):
+
+    def test_nested_functions_join_the_outer_session(self):
+        @with_db_session
+        def outer(session):
+            return session, add_business('49900000001'), current_session(), session.is_active
+
+        session, write_session, read_session, still_active = outer()
+
+        self.assertIs(write_session, session)
+        self.assertIs(read_session, session)
+        self.assertTrue(still_active)
+        self.assertEqual([business.business_ref for business in businesses()], ['49900000001'])
+
+    def test_failed_nested_function_only_rolls_back_its_savepoint(self):
+        @with_db_session
+        def outer(session):
+            add_business('49900000001')
+            with self.assertRaises(ValueError):
+                add_business('49900000002', fail=True)
+
+        outer()
+
+        self.assertEqual([business.business_ref for business in businesses()], ['49900000001'])
+
+    def test_write_nested_in_a_read_is_committed(self):
+        read_session, write_session = add_business_while_reading('49900000001')
+
+        self.assertIs(write_session, read_session)
+        self.assertEqual([business.business_ref for business in businesses()], ['49900000001'])
+
+    def test_write_nested_in_a_read_from_the_replica_is_committed(self):
+        replica_session = scoped_session(sessionmaker(bind=current_app.db), scopefunc=session_scope)
+        with patch.object(current_app.db, 'replica_session', replica_session):
+            read_session, write_session = add_business_while_reading('49900000001')
+
+        self.assertIsNot(write_session, read_session)
+        self.assertEqual([business.business_ref for business in businesses()], ['49900000001'])
+
+
+def show_statement_timeout(session):
+    return session.execute('SHOW statement_timeout').scalar()
+
+
+class TestStatementTimeouts(PartyTestClient):
+
+    def setUp(self):
+        current_app.config['DATABASE_STATEMENT_TIMEOUT'] = 1234
+        current_app.config['DATABASE_BULK_STATEMENT_TIMEOUT'] = 0
+
+    def test_sessions_have_the_statement_timeout(self):
+        self.assertEqual(with_db_session(show_statement_timeout)(), '1234ms')
+        self.assertEqual(with_query_only_db_session(show_statement_timeout)(), '1234ms')
+
+    def test_bulk_sessions_have_the_bulk_statement_timeout(self):
+        self.assertEqual(with_bulk_db_session(show_statement_timeout)(), '0')
+
+    def test_nested_functions_run_under_the_outer_statement_timeout(self):
+        @with_db_session
+        def outer(session):
+            return with_bulk_db_session(show_statement_timeout)()
+
+        self.assertEqual(outer(), '1234ms')
+
+    def test_statement_timeout_is_set_again_after_a_commit(self):
+        @with_db_session
+        def commit_and_show(session):
+            session.commit()
+            return show_statement_timeout(session)
+
+        self.assertEqual(commit_and_show(), '1234ms')
+
+    def test_statement_timeout_does_not_outlive_the_transaction(self):
+        with_db_session(show_statement_timeout)()
+        current_app.config['DATABASE_STATEMENT_TIMEOUT'] = 0
+
+        self.assertEqual(with_db_session(show_statement_timeout)(), '0')
+
+    def test_statements_that_run_too_long_are_cancelled(self):
+        current_app.config['DATABASE_STATEMENT_TIMEOUT'] = 10
+
+        with self.assertRaises(SQLAlchemyError):
+            with_db_session(lambda session: session.execute('SELECT pg_sleep(1)'))()